@@ -21,6 +21,7 @@
 
     'data': [
         'security/ir.model.access.csv',      
+        'data/ir_cron_data.xml',
         'views/material_view.xml',
     ],
     'demo': [
@@ -1,4 +1,10 @@
 # -*- coding: utf-8 -*-
 
 from . import controllers
-from . import jwt_helper
\ No newline at end of file
+from . import json_codec
+from . import response_helper
+from . import instrumentation
+from . import rate_limit
+from . import jwt_helper
+from . import response_cache
+from . import material_snapshot
\ No newline at end of file
@@ -1,13 +1,382 @@
-from odoo import http
+import odoo
+from odoo import api, http, SUPERUSER_ID
 from odoo.http import request, Response
-from odoo.addons.addons_material.controllers.jwt_helper import jwt_required, generate_jwt
+from odoo.addons.addons_material.controllers.jwt_helper import jwt_required, generate_jwt, get_token_cache_stats, \
+    token_cache, JWT_ACCESS_TOKEN_TTL
+from odoo.addons.addons_material.controllers.instrumentation import metrics
+from odoo.addons.addons_material.controllers.material_snapshot import material_snapshot
+from odoo.addons.addons_material.controllers.rate_limit import heavy_route
+from odoo.addons.addons_material.controllers.response_cache import get_response_cache, cached_route, \
+    current_generation
+from odoo.addons.addons_material.controllers.json_codec import dumps
+from odoo.addons.addons_material.controllers.response_helper import json_response, compress_response, \
+    compress_body, negotiate_encoding, API_COMPRESSION
 from odoo.exceptions import AccessDenied
+from dotenv import load_dotenv
 from psycopg2 import IntegrityError
+from werkzeug.http import http_date
+import base64
+import datetime
+import hashlib
 import json
 import logging
+import os
 
 _logger = logging.getLogger(__name__)
 
+load_dotenv()
+# the last page of the change feed hands out a cursor this many seconds back, so
+# that rows committed late by long transactions are still sent on the next poll
+MATERIAL_CHANGES_OVERLAP = int(os.getenv("MATERIAL_CHANGES_OVERLAP", "300"))
+
+MATERIAL_FIELDS = ['name', 'code', 'material_type', 'buy_price', 'supplier_id']
+WRITABLE_FIELDS = MATERIAL_FIELDS + ['currency_id']
+SUPPLIER_FIELDS = ['name', 'email', 'phone', 'street', 'city', 'country_id']
+EXPANDABLE = ['supplier']
+STATS_GROUPBY = ['material_type', 'supplier_id', 'currency_id']
+SEARCH_MODES = ['prefix', 'substring', 'fuzzy']
+MAX_SEARCH_LIMIT = 100
+IMPORT_FILE_TYPES = {'.csv': 'csv', '.xlsx': 'xlsx'}
+DEFAULT_CHANGES_LIMIT = 500
+DEFAULT_PAGE_LIMIT = 100
+MAX_PAGE_LIMIT = 1000
+EXPORT_BATCH_SIZE = 2000
+DUPLICATE_CODE_ERROR = 'Duplicate code. This material code already exists.'
+BATCH_OPERATIONS = ['create', 'update', 'delete']
+BATCH_MODES = ['atomic', 'best_effort']
+MAX_BATCH_OPERATIONS = 1000
+# fields a bulk delete may filter on; anything broader has to list ids
+BULK_DELETE_FILTERS = ['material_type', 'supplier_id']
+
+
+def _parse_page_params(limit=None, after=None, fields=None):
+    """Validate keyset pagination query parameters.
+
+    Returns ``(limit, after, field_names, error)``; ``error`` is a message
+    when the parameters are invalid, otherwise ``None``.
+    """
+    try:
+        limit = int(limit) if limit else DEFAULT_PAGE_LIMIT
+        after = int(after) if after else 0
+    except ValueError:
+        return None, None, None, 'limit and after must be integers'
+    if limit < 1 or after < 0:
+        return None, None, None, 'limit must be positive and after must not be negative'
+    limit = min(limit, MAX_PAGE_LIMIT)
+
+    field_names = MATERIAL_FIELDS
+    if fields:
+        field_names = [f.strip() for f in fields.split(',') if f.strip() and f.strip() != 'id']
+        invalid = [f for f in field_names if f not in MATERIAL_FIELDS]
+        if invalid:
+            return None, None, None, f'Invalid fields: {", ".join(invalid)}'
+        if not field_names:
+            # search_read() treats an empty list as "all fields"
+            field_names = ['id']
+    return limit, after, field_names, None
+
+
+def _validate_create_vals(vals):
+    """Return an error message when ``vals`` lacks what creating a material needs, else ``None``.
+
+    The buy price is checked separately, for a whole batch, by
+    ``Material._validate_buy_prices()``.
+    """
+    if not isinstance(vals, dict):
+        return 'Material values must be an object'
+    missing = [f for f in MATERIAL_FIELDS if not vals.get(f)]
+    if missing:
+        return f'Missing fields: {", ".join(missing)}'
+    if not isinstance(vals['code'], str):
+        return 'code must be a string'
+    return None
+
+
+def _search_materials(domain, field_names, limit=None, expand=None):
+    """Return the listing rows and, with ``expand='supplier'``, the side-loaded suppliers.
+
+    Expanded rows keep ``supplier_id`` as a plain id (no ``name_get``), and
+    every distinct supplier of the page is read once into a map keyed by id.
+    """
+    Material = request.env['material.material'].sudo()
+    if expand != 'supplier':
+        return Material.search_read(domain, field_names, limit=limit, order='id'), None
+
+    if 'supplier_id' not in field_names:
+        field_names = field_names + ['supplier_id']
+    rows = Material.search(domain, limit=limit, order='id').read(field_names, load=None)
+    supplier_ids = list({row['supplier_id'] for row in rows if row['supplier_id']})
+    suppliers = request.env['res.partner'].sudo().browse(supplier_ids).read(SUPPLIER_FIELDS)
+    return rows, {str(supplier['id']): supplier for supplier in suppliers}
+
+
+def _encode_changes_cursor(write_date, material_id, tombstone_id):
+    state = [write_date.isoformat() if write_date else None, material_id, tombstone_id]
+    return base64.urlsafe_b64encode(json.dumps(state).encode()).decode()
+
+
+def _decode_changes_cursor(cursor):
+    """Return ``(write_date, material_id, tombstone_id)``; raises ValueError on a bad cursor."""
+    if not cursor:
+        return None, 0, 0
+    try:
+        write_date, material_id, tombstone_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        write_date = datetime.datetime.fromisoformat(write_date) if write_date else None
+        return write_date, int(material_id), int(tombstone_id)
+    except (TypeError, ValueError, UnicodeError):
+        raise ValueError('Invalid cursor')
+
+
+def _rewind_changes_cursor(write_date, material_id, tombstone_id):
+    """Move the cursor of the last change feed page back into the MATERIAL_CHANGES_OVERLAP window.
+
+    Material write dates are transaction start times and tombstone ids are
+    drawn before commit, so either may show up behind a cursor already handed
+    out. The window is never moved forward.
+    """
+    window_start = datetime.datetime.utcnow() - datetime.timedelta(seconds=MATERIAL_CHANGES_OVERLAP)
+    if write_date and write_date > window_start:
+        write_date, material_id = window_start, 0
+    last_settled = request.env['material.tombstone'].sudo().search(
+        [('deleted_at', '<', window_start)], order='id desc', limit=1)
+    return write_date, material_id, min(tombstone_id, last_settled.id or 0)
+
+
+def _listing_validator(domain, variant, limit=None, snapshot=None, positions=None):
+    """Compute the ``(etag, last_modified)`` validator of a listing query.
+
+    ``variant`` identifies the representation (route and query parameters),
+    the rest is ``count`` and ``max(write_date)`` of the matching rows, taken
+    from ``positions`` of the in-memory ``snapshot`` when one is given.
+    """
+    if snapshot is not None:
+        count, last_write = snapshot.validator(positions)
+    else:
+        count, last_write = request.env['material.material'].sudo()._get_listing_validator(domain, limit=limit)
+    digest = hashlib.sha1(f'{variant}|{count}|{last_write}'.encode()).hexdigest()
+    return f'W/"{digest}"', last_write
+
+
+def _validator_headers(etag, last_modified):
+    headers = [('ETag', etag), ('Cache-Control', 'no-cache')]
+    if last_modified:
+        headers.append(('Last-Modified', http_date(last_modified)))
+    return headers
+
+
+def _is_not_modified(etag, last_modified):
+    """Evaluate If-None-Match, or If-Modified-Since when no ETag was sent."""
+    if_none_match = request.httprequest.headers.get('If-None-Match')
+    if if_none_match:
+        # weak comparison, as recommended for GET (RFC 7232 section 3.2)
+        tags = {tag.strip().replace('W/', '', 1) for tag in if_none_match.split(',')}
+        return '*' in tags or etag.replace('W/', '', 1) in tags
+    if_modified_since = request.httprequest.if_modified_since
+    if if_modified_since and last_modified:
+        if if_modified_since.tzinfo:
+            if_modified_since = if_modified_since.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+        return last_modified.replace(microsecond=0) <= if_modified_since
+    return False
+
+
+def _not_modified_response(etag, last_modified):
+    headers = _validator_headers(etag, last_modified)
+    if API_COMPRESSION:
+        # a 304 carries the Vary of the response it stands for
+        headers.append(('Vary', 'Accept-Encoding'))
+    return Response(status=304, headers=headers)
+
+
+def _cached_json_response(cache_key, domain, build_payload, limit=None, snapshot=None, positions=None):
+    """Serve ``build_payload()`` through the response cache and conditional GET.
+
+    ``domain`` and ``limit`` select the rows the ETag/Last-Modified validator
+    is computed on, or ``positions`` when the route reads from ``snapshot``;
+    ``build_payload`` only runs on a cache miss. Bodies are cached once per
+    content encoding, already compressed.
+    """
+    encoding = negotiate_encoding()
+    entry_key = f'{cache_key}|{encoding or "identity"}'
+    response_cache = get_response_cache(request.env.cr.dbname)
+    if snapshot is not None:
+        generation = response_cache.sync(snapshot.generation)
+    else:
+        generation = response_cache.sync(current_generation(request.env))
+    cached = response_cache.get(entry_key)
+    if cached:
+        body, etag, last_modified, content_encoding = cached
+    else:
+        body = None
+        etag, last_modified = _listing_validator(domain, cache_key, limit=limit, snapshot=snapshot, positions=positions)
+    if _is_not_modified(etag, last_modified):
+        return _not_modified_response(etag, last_modified)
+
+    if body is None:
+        body, content_encoding = compress_body(dumps(build_payload()), encoding)
+        response_cache.set(generation, entry_key, body, etag, last_modified, content_encoding)
+    return json_response(body, headers=_validator_headers(etag, last_modified), content_encoding=content_encoding)
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _check_batch_operations(operations):
+    """Validate a batch against the database and against the operations before each one.
+
+    Returns ``{index: (status, error)}`` for the operations that cannot be
+    applied. Records and codes are read with one query each, then the batch
+    is replayed in order so that e.g. a code freed by an earlier delete can be
+    reused by a later create.
+    """
+    Material = request.env['material.material'].sudo()
+    errors = {}
+    for index, operation in enumerate(operations):
+        if not isinstance(operation, dict) or operation.get('op') not in BATCH_OPERATIONS:
+            errors[index] = (400, f'op must be one of: {", ".join(BATCH_OPERATIONS)}')
+            continue
+        op = operation['op']
+        values = operation.get('values')
+        if op != 'create' and (not isinstance(operation.get('id'), int) or isinstance(operation['id'], bool)):
+            error = 'id must be an integer'
+        elif op == 'create':
+            error = _validate_create_vals(values)
+        elif op == 'update' and (not isinstance(values, dict) or not values):
+            error = 'values must be a non-empty object'
+        elif op == 'update' and any(f not in WRITABLE_FIELDS for f in values):
+            error = f'Invalid fields: {", ".join(f for f in values if f not in WRITABLE_FIELDS)}'
+        elif op == 'update' and 'code' in values and not isinstance(values['code'], str):
+            error = 'code must be a string'
+        else:
+            error = None
+        if error:
+            errors[index] = (400, error)
+
+    valued = [index for index, operation in enumerate(operations) if index not in errors and operation['op'] != 'delete']
+    price_errors = Material._validate_buy_prices([operations[index]['values'] for index in valued])
+    for position, message in price_errors.items():
+        errors[valued[position]] = (400, message)
+
+    valid = [(index, operation) for index, operation in enumerate(operations) if index not in errors]
+    ids = {operation['id'] for _index, operation in valid if operation['op'] != 'create'}
+    codes = {operation['values']['code'] for _index, operation in valid
+             if operation['op'] != 'delete' and operation['values'].get('code')}
+    current_code = {row['id']: row['code'] for row in Material.browse(list(ids)).exists().read(['code'])}
+    owner = {row['code']: row['id'] for row in Material.search_read([('code', 'in', list(codes))], ['code'])} \
+        if codes else {}
+
+    for index, operation in valid:
+        op = operation['op']
+        record_id = operation.get('id') if op != 'create' else ('new', index)
+        if op != 'create' and record_id not in current_code:
+            errors[index] = (404, 'Material not found')
+            continue
+        if op == 'delete':
+            owner.pop(current_code.pop(record_id), None)
+            continue
+        code = operation['values'].get('code')
+        if not code:
+            continue
+        if owner.get(code, record_id) != record_id:
+            errors[index] = (409, DUPLICATE_CODE_ERROR)
+            continue
+        owner.pop(current_code.get(record_id), None)
+        current_code[record_id] = code
+        owner[code] = record_id
+    return errors
+
+
+def _lookup_materials(field_name, values):
+    """Resolve ``values`` of ``field_name`` (``id`` or ``code``) with one ``search_read``.
+
+    Returns ``(rows, missing)`` with the rows in the order of ``values``. Reads
+    from the in-memory snapshot instead when it is enabled.
+    """
+    values = list(dict.fromkeys(values))
+    if material_snapshot.enabled:
+        snapshot = material_snapshot.get(request.env)
+        positions = snapshot.positions_by_ids(values) if field_name == 'id' else snapshot.positions_by_codes(values)
+        rows = snapshot.rows(positions, MATERIAL_FIELDS)
+    else:
+        rows = request.env['material.material'].sudo().search_read([(field_name, 'in', values)], MATERIAL_FIELDS)
+    rows_by_value = {row[field_name]: row for row in rows}
+    return (
+        [rows_by_value[value] for value in values if value in rows_by_value],
+        [value for value in values if value not in rows_by_value],
+    )
+
+
+def _is_int(value):
+    # JSON true/false arrive as bool, which is an int subclass
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _bulk_delete_domain(filters, material_types):
+    """Build the domain of a bulk delete filter; returns ``(domain, error)``.
+
+    Values are checked strictly: a string ``supplier_id`` would otherwise be
+    matched against partner names by the ORM.
+    """
+    if not isinstance(filters, dict) or not filters:
+        return None, 'filter must be a non-empty object'
+    unknown = [f for f in filters if f not in BULK_DELETE_FILTERS]
+    if unknown:
+        return None, f'Invalid filter fields: {", ".join(unknown)}'
+    domain = []
+    for field_name, value in filters.items():
+        values = value if isinstance(value, list) else [value]
+        if not values:
+            return None, f'{field_name} must not be empty'
+        if field_name == 'supplier_id' and not all(_is_int(v) for v in values):
+            return None, 'supplier_id must be an integer or a list of integers'
+        if field_name == 'material_type' and not all(isinstance(v, str) and v in material_types for v in values):
+            return None, f'material_type must be one of: {", ".join(material_types)}'
+        domain.append((field_name, 'in', values))
+    return domain, None
+
+
+def _batch_runs(operations, skip):
+    """Group consecutive operations of the same kind into ``(op, indexes)`` runs.
+
+    An update run is split when it would touch the same record twice, so
+    that grouping its writes by values cannot reorder them.
+    """
+    runs = []
+    run_ids = set()
+    for index, operation in enumerate(operations):
+        if index in skip:
+            continue
+        op = operation['op']
+        if not runs or runs[-1][0] != op or (op == 'update' and operation['id'] in run_ids):
+            runs.append((op, []))
+            run_ids = set()
+        runs[-1][1].append(index)
+        run_ids.add(operation.get('id'))
+    return runs
+
+
+def _apply_batch_run(op, indexes, operations):
+    """Apply a run with one set-based ORM call per kind; return ``{index: record id}``."""
+    Material = request.env['material.material'].sudo()
+    if op == 'create':
+        records = Material.create([dict(operations[index]['values']) for index in indexes])
+        Material.flush()
+        return dict(zip(indexes, records.ids))
+    if op == 'update':
+        write_groups = {}
+        for index in indexes:
+            values = operations[index]['values']
+            key = json.dumps(values, sort_keys=True)
+            write_groups.setdefault(key, (values, []))[1].append(operations[index]['id'])
+        for values, record_ids in write_groups.values():
+            Material.browse(record_ids).write(values)
+    else:
+        Material.browse([operations[index]['id'] for index in indexes]).unlink()
+    Material.flush()
+    return {index: operations[index]['id'] for index in indexes}
+
+
 class MaterialController(http.Controller):
 
     @http.route('/api/login', type='json', auth='public', methods=['POST'], csrf=False, cors='*')
@@ -46,39 +415,302 @@ class MaterialController(http.Controller):
                 'status': 400
             }
 
-        token = generate_jwt(user.id)
+        refresh_token, session = request.env['material.api.refresh.token'].sudo()._issue(user.id)
         return {
             'user': user.partner_id.id if user.partner_id else user.id,
-            'token': token,
+            'token': generate_jwt(user.id, session.id),
+            'refresh_token': refresh_token,
+            'expires_in': JWT_ACCESS_TOKEN_TTL,
             'status': 200
         }
 
+    @http.route('/api/token/refresh', type='json', auth='none', methods=['POST'], csrf=False, cors='*')
+    def refresh_token(self, refresh_token=None, **kwargs):
+        """
+        Exchange a refresh token for a new access token without re-checking the password.
+
+        The refresh token is rotated: the one sent is no longer valid afterwards.
+        """
+        if not refresh_token:
+            return {'error': 'Refresh token is required', 'status': 400}
+        new_refresh_token, session = request.env['material.api.refresh.token'].sudo()._rotate(refresh_token)
+        if not session or not session.user_id.active:
+            return {'error': 'Invalid refresh token', 'status': 401}
+        return {
+            'token': generate_jwt(session.user_id.id, session.id),
+            'refresh_token': new_refresh_token,
+            'expires_in': JWT_ACCESS_TOKEN_TTL,
+            'status': 200
+        }
+
+    @http.route('/api/token/revoke', type='json', auth='none', methods=['POST'], csrf=False, cors='*')
+    def revoke_token(self, refresh_token=None, **kwargs):
+        """Revoke a refresh token together with the access tokens minted from it.
+
+        Answers 200 for unknown tokens as well, so the route cannot be used to
+        probe for valid ones.
+        """
+        if not refresh_token:
+            return {'error': 'Refresh token is required', 'status': 400}
+        session = request.env['material.api.refresh.token'].sudo()._revoke(refresh_token)
+        if session:
+            # other workers drop theirs within JWT_REVOCATION_CHECK_INTERVAL
+            token_cache.discard_sessions({session.id})
+        return {'message': 'Token revoked', 'status': 200}
+
+    @http.route('/api/metrics', type='http', auth='none', cors='*', methods=['GET'], csrf=False)
+    @jwt_required
+    def get_metrics(self, **kwargs):
+        """Prometheus metrics of the API routes served by this worker."""
+        cache_stats = get_token_cache_stats()
+        body = metrics.render({
+            'material_api_jwt_cache_hits_total': ('Requests authenticated from the JWT cache.', cache_stats['hits']),
+            'material_api_jwt_cache_misses_total': ('Requests that verified their JWT.', cache_stats['misses']),
+        })
+        return Response(body, status=200, content_type='text/plain; version=0.0.4; charset=utf-8')
+
     @http.route('/api/materials', type='http', auth='none', cors='*', methods=['GET'], csrf=False)
     @jwt_required
-    def get_all_materials(self, **kwargs):
-        materials = request.env['material.material'].sudo().search_read([], ['name', 'code', 'material_type', 'buy_price', 'supplier_id'])
-        return Response(
-            json.dumps({'status': 200, 'data': materials}),
+    @heavy_route
+    @cached_route
+    def get_all_materials(self, limit=None, after=None, fields=None, expand=None, supplier_id=None, **kwargs):
+        limit, after, field_names, error = _parse_page_params(limit, after, fields)
+        if error:
+            return json_response({'status': 400, 'error': error}, status=400)
+        if expand and expand not in EXPANDABLE:
+            return json_response({'status': 400, 'error': f'expand must be one of: {", ".join(EXPANDABLE)}'}, status=400)
+        try:
+            supplier_id = int(supplier_id) if supplier_id else None
+        except ValueError:
+            return json_response({'status': 400, 'error': 'supplier_id must be an integer'}, status=400)
+
+        domain = [('id', '>', after)]
+        if supplier_id:
+            domain.append(('supplier_id', '=', supplier_id))
+        # keyset pagination: fetch one extra row to know whether another page exists
+        snapshot = material_snapshot.get(request.env) if material_snapshot.enabled and not expand else None
+        positions = snapshot.select(after=after, limit=limit + 1, supplier_id=supplier_id) if snapshot else None
+
+        def build_payload():
+            if snapshot is not None:
+                materials, suppliers = snapshot.rows(positions, field_names), None
+            else:
+                materials, suppliers = _search_materials(domain, field_names, limit=limit + 1, expand=expand)
+            next_cursor = None
+            if len(materials) > limit:
+                materials = materials[:limit]
+                next_cursor = materials[-1]['id']
+            payload = {'status': 200, 'data': materials, 'next_cursor': next_cursor}
+            if suppliers is not None:
+                payload['suppliers'] = suppliers
+            return payload
+
+        cache_key = f'all|{after}|{limit}|{",".join(field_names)}|{expand or ""}|{supplier_id or ""}'
+        return _cached_json_response(
+            cache_key, domain, build_payload, limit=limit + 1, snapshot=snapshot, positions=positions)
+
+    @http.route('/api/materials/export', type='http', auth='none', cors='*', methods=['GET'], csrf=False)
+    @jwt_required
+    @heavy_route
+    def export_materials(self, **kwargs):
+        """Stream the whole catalogue as newline-delimited JSON, one batch at a time."""
+        dbname = request.env.cr.dbname
+
+        def generate():
+            # The request cursor is closed and the request environments are
+            # released as soon as the response is returned, so the stream sets
+            # up its own environment and reads through its own (repeatable
+            # read) cursor, and therefore exports a consistent snapshot.
+            try:
+                with api.Environment.manage(), odoo.registry(dbname).cursor() as cr:
+                    Material = api.Environment(cr, SUPERUSER_ID, {})['material.material']
+                    last_id = 0
+                    while True:
+                        rows = Material.search_read(
+                            [('id', '>', last_id)], MATERIAL_FIELDS, limit=EXPORT_BATCH_SIZE, order='id')
+                        if not rows:
+                            break
+                        last_id = rows[-1]['id']
+                        yield b''.join(dumps(row) + b'\n' for row in rows)
+                        Material.invalidate_cache()
+            except Exception:
+                _logger.exception("Material export stream aborted")
+                # abort the chunked response: ending it normally would pass a
+                # truncated export off as a complete one
+                raise
+
+        return compress_response(Response(
+            generate(),
             status=200,
-            content_type='application/json'
-        )
+            content_type='application/x-ndjson',
+            direct_passthrough=True
+        ))
 
     @http.route('/api/materials/type/<string:material_type>', type='http', auth='none', cors='*', methods=['GET'], csrf=False)
     @jwt_required
-    def get_all_materials_filter_type(self, material_type=None, **kwargs):
-        if material_type.lower() not in ['fabric', 'jeans', 'cotton']:
-            return Response(
-                json.dumps({'status': 400, 'error': 'Invalid material type'}),
-                status=400,
-                content_type='application/json'
+    @heavy_route
+    @cached_route
+    def get_all_materials_filter_type(self, material_type=None, expand=None, **kwargs):
+        material_type = material_type.lower()
+        if material_type not in ['fabric', 'jeans', 'cotton']:
+            return json_response({'status': 400, 'error': 'Invalid material type'}, status=400)
+        if expand and expand not in EXPANDABLE:
+            return json_response({'status': 400, 'error': f'expand must be one of: {", ".join(EXPANDABLE)}'}, status=400)
+        domain = [('material_type', '=', material_type)]
+        snapshot = material_snapshot.get(request.env) if material_snapshot.enabled and not expand else None
+        positions = snapshot.select(material_type=material_type) if snapshot else None
+
+        def build_payload():
+            if snapshot is not None:
+                materials, suppliers = snapshot.rows(positions, MATERIAL_FIELDS), None
+            else:
+                materials, suppliers = _search_materials(domain, MATERIAL_FIELDS, expand=expand)
+            payload = {'status': 200, 'data': materials}
+            if suppliers is not None:
+                payload['suppliers'] = suppliers
+            return payload
+
+        return _cached_json_response(
+            f'type|{material_type}|{expand or ""}', domain, build_payload, snapshot=snapshot, positions=positions)
+
+    @http.route('/api/materials/<int:material_id>', type='http', auth='none', cors='*', methods=['GET'], csrf=False)
+    @jwt_required
+    @cached_route
+    def get_material(self, material_id, **kwargs):
+        rows, _missing = _lookup_materials('id', [material_id])
+        if not rows:
+            return json_response({'status': 404, 'error': 'Material not found'}, status=404)
+        return json_response({'status': 200, 'data': rows[0]})
+
+    @http.route('/api/materials/by_code/<string:code>', type='http', auth='none', cors='*', methods=['GET'], csrf=False)
+    @jwt_required
+    @cached_route
+    def get_material_by_code(self, code, **kwargs):
+        rows, _missing = _lookup_materials('code', [code])
+        if not rows:
+            return json_response({'status': 404, 'error': 'Material not found'}, status=404)
+        return json_response({'status': 200, 'data': rows[0]})
+
+    @http.route('/api/materials/lookup', type='http', auth='none', cors='*', methods=['GET'], csrf=False)
+    @jwt_required
+    @cached_route
+    def lookup_materials(self, ids=None, codes=None, **kwargs):
+        """Fetch several materials by comma-separated ``ids`` or ``codes`` in one query; unknown ones are listed in ``missing``."""
+        if bool(ids) == bool(codes):
+            return json_response({'status': 400, 'error': 'Provide either ids or codes'}, status=400)
+        if ids:
+            try:
+                field_name, values = 'id', [int(i) for i in ids.split(',') if i.strip()]
+            except ValueError:
+                return json_response({'status': 400, 'error': 'ids must be integers'}, status=400)
+        else:
+            field_name, values = 'code', [c.strip() for c in codes.split(',') if c.strip()]
+        if not values:
+            return json_response({'status': 400, 'error': f'{field_name} list is empty'}, status=400)
+        if len(values) > MAX_PAGE_LIMIT:
+            return json_response({'status': 400, 'error': f'At most {MAX_PAGE_LIMIT} values per lookup'}, status=400)
+
+        rows, missing = _lookup_materials(field_name, values)
+        return json_response({'status': 200, 'data': rows, 'missing': missing})
+
+    @http.route('/api/materials/stats', type='http', auth='none', cors='*', methods=['GET'], csrf=False)
+    @jwt_required
+    @heavy_route
+    @cached_route
+    def get_material_stats(self, groupby='material_type', by_currency=None, **kwargs):
+        """Count and min/avg/max ``buy_price`` per group, computed by one ``read_group``."""
+        groupbys = [g.strip() for g in groupby.split(',') if g.strip()]
+        invalid = [g for g in groupbys if g not in STATS_GROUPBY]
+        if not groupbys or invalid:
+            return json_response(
+                {'status': 400, 'error': f'groupby must be a list of: {", ".join(STATS_GROUPBY)}'}, status=400)
+        if by_currency in ('1', 'true') and 'currency_id' not in groupbys:
+            # prices in different currencies cannot be aggregated together
+            groupbys.append('currency_id')
+
+        def build_payload():
+            groups = request.env['material.material'].sudo().read_group(
+                [],
+                ['min_buy_price:min(buy_price)', 'avg_buy_price:avg(buy_price)', 'max_buy_price:max(buy_price)'],
+                groupbys,
+                lazy=False,
             )
-        materials = request.env['material.material'].sudo().search_read(
-            [('material_type', '=', material_type)], ['name', 'code', 'material_type', 'buy_price', 'supplier_id'])
-        return Response(
-            json.dumps({'status': 200, 'data': materials}),
-            status=200,
-            content_type='application/json'
-        )
+            data = [dict(
+                {g: group[g] for g in groupbys},
+                count=group['__count'],
+                min_buy_price=group['min_buy_price'],
+                avg_buy_price=group['avg_buy_price'],
+                max_buy_price=group['max_buy_price'],
+            ) for group in groups]
+            return {'status': 200, 'groupby': groupbys, 'data': data}
+
+        return _cached_json_response(f'stats|{",".join(groupbys)}', [], build_payload)
+
+    @http.route('/api/materials/changes', type='http', auth='none', cors='*', methods=['GET'], csrf=False)
+    @jwt_required
+    def get_material_changes(self, since=None, limit=None, **kwargs):
+        """
+        Materials created or updated, and tombstones of deleted ones, after the ``since`` cursor.
+
+        The cursor of the last page (``has_more`` false) re-reads the changes of
+        the last MATERIAL_CHANGES_OVERLAP seconds, so a client polling the feed
+        receives some rows again and must dedupe updates and deletions by id.
+        """
+        try:
+            write_date, material_id, tombstone_id = _decode_changes_cursor(since)
+            limit = min(int(limit), MAX_PAGE_LIMIT) if limit else DEFAULT_CHANGES_LIMIT
+        except ValueError as e:
+            return json_response({'status': 400, 'error': str(e)}, status=400)
+        if limit < 1:
+            return json_response({'status': 400, 'error': 'limit must be positive'}, status=400)
+
+        Material = request.env['material.material'].sudo()
+        changed_ids = Material._get_changes(write_date, material_id, limit=limit + 1)
+        tombstones = request.env['material.tombstone'].sudo().search_read(
+            [('id', '>', tombstone_id)], ['material_id', 'code', 'deleted_at'], limit=limit + 1, order='id')
+        has_more = len(changed_ids) > limit or len(tombstones) > limit
+        changed_ids, tombstones = changed_ids[:limit], tombstones[:limit]
+
+        records = Material.browse(changed_ids)
+        rows = {row['id']: row for row in records.read(MATERIAL_FIELDS + ['write_date'])}
+        updated = [rows[changed_id] for changed_id in changed_ids]
+        if updated:
+            write_date, material_id = updated[-1]['write_date'], updated[-1]['id']
+        if tombstones:
+            tombstone_id = tombstones[-1]['id']
+        if not has_more:
+            write_date, material_id, tombstone_id = _rewind_changes_cursor(write_date, material_id, tombstone_id)
+        return json_response({
+            'status': 200,
+            'updated': updated,
+            'deleted': [
+                {'id': t['material_id'], 'code': t['code'], 'deleted_at': t['deleted_at']} for t in tombstones
+            ],
+            'next_cursor': _encode_changes_cursor(write_date, material_id, tombstone_id),
+            'has_more': has_more,
+        })
+
+    @http.route('/api/materials/search', type='http', auth='none', cors='*', methods=['GET'], csrf=False)
+    @jwt_required
+    def search_materials(self, q=None, mode='substring', limit=None, **kwargs):
+        """Ranked typeahead search over material name and code."""
+        if not q or not q.strip():
+            return json_response({'status': 400, 'error': 'q is required'}, status=400)
+        if mode not in SEARCH_MODES:
+            return json_response({'status': 400, 'error': f'mode must be one of: {", ".join(SEARCH_MODES)}'}, status=400)
+        try:
+            limit = min(int(limit), MAX_SEARCH_LIMIT) if limit else 20
+        except ValueError:
+            return json_response({'status': 400, 'error': 'limit must be an integer'}, status=400)
+        if limit < 1:
+            return json_response({'status': 400, 'error': 'limit must be positive'}, status=400)
+
+        Material = request.env['material.material'].sudo()
+        matches = Material._search_by_text(q.strip(), mode=mode, limit=limit)
+        scores = dict(matches)
+        rows = {row['id']: row for row in Material.browse(list(scores)).read(MATERIAL_FIELDS)}
+        data = [dict(rows[material_id], score=score) for material_id, score in matches if material_id in rows]
+        return json_response({'status': 200, 'data': data})
 
     @http.route('/api/materials/create', type='json', auth='none', methods=['POST'], csrf=False, cors='*')
     @jwt_required
@@ -95,9 +727,9 @@ class MaterialController(http.Controller):
             if existing:
                 return {'status': 409, 'error': 'Duplicate code. This material code already exists.'}
 
-        buy_price = kwargs.get('buy_price', False)
-        if not buy_price or float(buy_price) < 100:
-            return {'status': 400, 'error': 'Buy price must be at least 100'}
+        price_errors = request.env['material.material']._validate_buy_prices([kwargs])
+        if price_errors:
+            return {'status': 400, 'error': price_errors[0]}
 
         try:
             material = request.env['material.material'].sudo().create(kwargs)
@@ -107,6 +739,266 @@ class MaterialController(http.Controller):
             request.env.cr.rollback()
             return {'status': 500, 'error': str(e)}
 
+    @http.route('/api/materials/bulk_create', type='json', auth='none', methods=['POST'], csrf=False, cors='*')
+    @jwt_required
+    @heavy_route
+    def bulk_create_materials(self, materials=None, chunk_size=None, **kwargs):
+        """Create many materials with one duplicate check and batched ``create()`` calls.
+
+        Without ``chunk_size`` every valid row is inserted in a single transaction;
+        with it, each chunk is committed on its own so a failing chunk does not
+        discard the ones already imported.
+        """
+        if not isinstance(materials, list) or not materials:
+            return {'status': 400, 'error': 'materials must be a non-empty list'}
+        try:
+            chunk_size = int(chunk_size) if chunk_size else None
+        except (TypeError, ValueError):
+            return {'status': 400, 'error': 'chunk_size must be an integer'}
+        if chunk_size is not None and chunk_size < 1:
+            return {'status': 400, 'error': 'chunk_size must be positive'}
+
+        Material = request.env['material.material'].sudo()
+        codes = list({vals['code'] for vals in materials if isinstance(vals, dict) and isinstance(vals.get('code'), str)})
+        taken = {row['code'] for row in Material.search_read([('code', 'in', codes)], ['code'])} if codes else set()
+
+        price_errors = Material._validate_buy_prices(materials)
+        results = [None] * len(materials)
+        pending = []
+        for index, vals in enumerate(materials):
+            error = _validate_create_vals(vals) or price_errors.get(index)
+            if error:
+                results[index] = {'index': index, 'status': 400, 'error': error}
+            elif vals['code'] in taken:
+                results[index] = {'index': index, 'status': 409, 'error': DUPLICATE_CODE_ERROR}
+            else:
+                taken.add(vals['code'])
+                pending.append((index, dict(vals)))
+
+        for chunk in _chunks(pending, chunk_size or len(pending) or 1):
+            try:
+                records = Material.create([vals for _index, vals in chunk])
+                if chunk_size:
+                    request.env.cr.commit()
+            except Exception as e:
+                request.env.cr.rollback()
+                if not chunk_size:
+                    return {'status': 500, 'error': str(e)}
+                for index, _vals in chunk:
+                    results[index] = {'index': index, 'status': 500, 'error': str(e)}
+                continue
+            for (index, _vals), record in zip(chunk, records):
+                results[index] = {'index': index, 'status': 201, 'id': record.id}
+
+        created = sum(1 for result in results if result['status'] == 201)
+        return {
+            'status': 201 if created == len(results) else 207,
+            'created': created,
+            'failed': len(results) - created,
+            'results': results,
+        }
+
+    @http.route('/api/materials/upsert', type='json', auth='none', methods=['POST'], csrf=False, cors='*')
+    @jwt_required
+    @heavy_route
+    def upsert_materials(self, materials=None, **kwargs):
+        """Update materials matched by ``code`` and create the missing ones.
+
+        Codes are resolved with a single query, rows carrying identical values
+        share one ``write()`` and new materials are inserted in one ``create()``.
+        """
+        if not isinstance(materials, list) or not materials:
+            return {'status': 400, 'error': 'materials must be a non-empty list'}
+
+        Material = request.env['material.material'].sudo()
+        price_errors = Material._validate_buy_prices(materials)
+        results = [None] * len(materials)
+        rows = []
+        seen = set()
+        for index, vals in enumerate(materials):
+            if not isinstance(vals, dict) or not vals.get('code') or not isinstance(vals['code'], str):
+                results[index] = {'index': index, 'status': 400, 'error': 'Each material needs a code'}
+                continue
+            unknown = [f for f in vals if f not in WRITABLE_FIELDS]
+            if unknown:
+                results[index] = {'index': index, 'status': 400, 'error': f'Invalid fields: {", ".join(unknown)}'}
+                continue
+            if index in price_errors:
+                results[index] = {'index': index, 'status': 400, 'error': price_errors[index]}
+                continue
+            if vals['code'] in seen:
+                results[index] = {'index': index, 'status': 409, 'error': 'Code appears more than once in this request'}
+                continue
+            seen.add(vals['code'])
+            rows.append((index, vals))
+
+        code_to_id = {
+            row['code']: row['id']
+            for row in Material.search_read([('code', 'in', list(seen))], ['code'])
+        } if seen else {}
+
+        write_groups = {}
+        to_create = []
+        for index, vals in rows:
+            if vals['code'] in code_to_id:
+                record_id = code_to_id[vals['code']]
+                update_vals = {k: v for k, v in vals.items() if k != 'code'}
+                results[index] = {'index': index, 'status': 200, 'id': record_id}
+                if update_vals:
+                    key = json.dumps(update_vals, sort_keys=True)
+                    write_groups.setdefault(key, (update_vals, []))[1].append(record_id)
+                continue
+            error = _validate_create_vals(vals)
+            if error:
+                results[index] = {'index': index, 'status': 400, 'error': error}
+            else:
+                to_create.append((index, dict(vals)))
+
+        try:
+            for update_vals, record_ids in write_groups.values():
+                Material.browse(record_ids).write(update_vals)
+            created = Material.create([vals for _index, vals in to_create]) if to_create else Material
+        except Exception as e:
+            request.env.cr.rollback()
+            return {'status': 500, 'error': str(e)}
+
+        for (index, _vals), record in zip(to_create, created):
+            results[index] = {'index': index, 'status': 201, 'id': record.id}
+
+        failed = sum(1 for result in results if result['status'] not in (200, 201))
+        return {
+            'status': 207 if failed else 200,
+            'updated': sum(1 for result in results if result['status'] == 200),
+            'created': len(created),
+            'failed': failed,
+            'results': results,
+        }
+
+    @http.route('/api/materials/batch', type='json', auth='none', methods=['POST'], csrf=False, cors='*')
+    @jwt_required
+    @heavy_route
+    def batch_materials(self, operations=None, mode='atomic', **kwargs):
+        """Apply an ordered list of create/update/delete operations in one transaction.
+
+        Each operation is ``{"op": "create", "values": {...}}``,
+        ``{"op": "update", "id": 1, "values": {...}}`` or ``{"op": "delete", "id": 1}``.
+        Consecutive operations of the same kind run as one ``create()``, grouped
+        ``write()`` calls or one ``unlink()``. In ``atomic`` mode nothing is
+        applied unless every operation succeeds; in ``best_effort`` mode failing
+        operations are reported and the others are kept.
+        """
+        if not isinstance(operations, list) or not operations:
+            return {'status': 400, 'error': 'operations must be a non-empty list'}
+        if len(operations) > MAX_BATCH_OPERATIONS:
+            return {'status': 400, 'error': f'At most {MAX_BATCH_OPERATIONS} operations per batch'}
+        if mode not in BATCH_MODES:
+            return {'status': 400, 'error': f'mode must be one of: {", ".join(BATCH_MODES)}'}
+
+        def result(index, status, **values):
+            operation = operations[index]
+            return dict(index=index, op=operation.get('op') if isinstance(operation, dict) else None,
+                        status=status, **values)
+
+        errors = _check_batch_operations(operations)
+        results = [None] * len(operations)
+        for index, (status, error) in errors.items():
+            results[index] = result(index, status, error=error)
+        if errors and mode == 'atomic':
+            for index, entry in enumerate(results):
+                if entry is None:
+                    results[index] = result(index, 424, error='Not applied: another operation is invalid')
+            return {'status': 400, 'error': 'Invalid operations, nothing was applied',
+                    'applied': 0, 'failed': len(errors), 'results': results}
+
+        for op, indexes in _batch_runs(operations, errors):
+            try:
+                if mode == 'atomic':
+                    record_ids = _apply_batch_run(op, indexes, operations)
+                else:
+                    with request.env.cr.savepoint():
+                        record_ids = _apply_batch_run(op, indexes, operations)
+            except Exception as e:
+                if mode == 'atomic':
+                    request.env.cr.rollback()
+                    return {'status': 500, 'error': str(e)}
+                # retry the run one operation at a time to keep the good ones
+                request.env['material.material'].invalidate_cache()
+                record_ids = {}
+                for index in indexes:
+                    try:
+                        with request.env.cr.savepoint():
+                            record_ids.update(_apply_batch_run(op, [index], operations))
+                    except Exception as e:
+                        request.env['material.material'].invalidate_cache()
+                        results[index] = result(index, 500, error=str(e))
+            for index, record_id in record_ids.items():
+                results[index] = result(index, 201 if op == 'create' else 200, id=record_id)
+
+        failed = sum(1 for entry in results if entry['status'] not in (200, 201))
+        return {
+            'status': 207 if failed else 200,
+            'applied': len(results) - failed,
+            'failed': failed,
+            'results': results,
+        }
+
+    @http.route('/api/materials/import', type='http', auth='none', methods=['POST'], csrf=False, cors='*')
+    @jwt_required
+    @heavy_route
+    def import_materials(self, file=None, chunk_size=None, **kwargs):
+        """Store an uploaded CSV/XLSX file and queue its import as a background job."""
+        if not file or not file.filename:
+            return json_response({'status': 400, 'error': 'A CSV or XLSX file is required'}, status=400)
+        file_type = IMPORT_FILE_TYPES.get(os.path.splitext(file.filename)[1].lower())
+        if not file_type:
+            return json_response({'status': 400, 'error': 'Only .csv and .xlsx files are supported'}, status=400)
+        try:
+            chunk_size = int(chunk_size) if chunk_size else 1000
+        except ValueError:
+            return json_response({'status': 400, 'error': 'chunk_size must be an integer'}, status=400)
+        if chunk_size < 1:
+            return json_response({'status': 400, 'error': 'chunk_size must be positive'}, status=400)
+
+        attachment = request.env['ir.attachment'].sudo().create({
+            'name': file.filename,
+            'raw': file.read(),
+        })
+        job = request.env['material.import.job'].sudo().create({
+            'name': file.filename,
+            'attachment_id': attachment.id,
+            'file_type': file_type,
+            'chunk_size': chunk_size,
+        })
+        attachment.write({'res_model': job._name, 'res_id': job.id})
+        request.env.ref('addons_material.ir_cron_material_import').sudo()._trigger()
+        return json_response({'status': 202, 'job_id': job.id}, status=202)
+
+    @http.route('/api/materials/import/<int:job_id>', type='http', auth='none', cors='*', methods=['GET'], csrf=False)
+    @jwt_required
+    def get_import_status(self, job_id, errors_limit=None, **kwargs):
+        job = request.env['material.import.job'].sudo().browse(job_id)
+        if not job.exists():
+            return json_response({'status': 404, 'error': 'Import job not found'}, status=404)
+        try:
+            errors_limit = min(int(errors_limit), MAX_PAGE_LIMIT) if errors_limit else 100
+        except ValueError:
+            return json_response({'status': 400, 'error': 'errors_limit must be an integer'}, status=400)
+        if errors_limit < 1:
+            return json_response({'status': 400, 'error': 'errors_limit must be positive'}, status=400)
+
+        errors = request.env['material.import.error'].sudo().search_read(
+            [('job_id', '=', job.id)], ['row', 'code', 'message'], limit=errors_limit)
+        return json_response({
+            'status': 200,
+            'job_id': job.id,
+            'state': job.state,
+            'processed_rows': job.processed_rows,
+            'created': job.created_count,
+            'error_count': job.error_count,
+            'errors': [{k: error[k] for k in ('row', 'code', 'message')} for error in errors],
+            'message': job.message or None,
+        })
+
     @http.route('/api/materials/update/<int:material_id>', type='json', auth='none', methods=['POST'], csrf=False, cors='*')
     @jwt_required
     def update_material(self, material_id, **kwargs):
@@ -120,9 +1012,9 @@ class MaterialController(http.Controller):
             if existing:
                 return {'status': 409, 'error': 'Duplicate code. This material code already exists.'}
 
-        buy_price = kwargs.get('buy_price', False)
-        if buy_price and float(buy_price) < 100:
-            return {'status': 400, 'error': 'Buy price must be at least 100'}
+        price_errors = request.env['material.material']._validate_buy_prices([kwargs])
+        if price_errors:
+            return {'status': 400, 'error': price_errors[0]}
 
         try:
             material.write(kwargs)
@@ -132,28 +1024,68 @@ class MaterialController(http.Controller):
             request.env.cr.rollback()
             return {'status': 500, 'error': str(e)}
 
+    @http.route('/api/materials/bulk_delete', type='json', auth='none', methods=['POST'], csrf=False, cors='*')
+    @jwt_required
+    @heavy_route
+    def bulk_delete_materials(self, ids=None, filter=None, chunk_size=None, **kwargs):
+        """Delete the materials listed in ``ids`` or matching ``filter`` with set-based ``unlink()`` calls.
+
+        ``filter`` only accepts ``material_type`` and ``supplier_id`` (a value
+        or a list of values). Without ``chunk_size`` everything is deleted in
+        one call and one transaction; with it, each chunk is committed on its
+        own so that very large deletions do not hold locks for their whole run.
+        """
+        if (ids is None) == (filter is None):
+            return {'status': 400, 'error': 'Provide either ids or filter'}
+        try:
+            chunk_size = int(chunk_size) if chunk_size else None
+        except (TypeError, ValueError):
+            return {'status': 400, 'error': 'chunk_size must be an integer'}
+        if chunk_size is not None and chunk_size < 1:
+            return {'status': 400, 'error': 'chunk_size must be positive'}
+
+        Material = request.env['material.material'].sudo()
+        missing_ids = []
+        if ids is not None:
+            if not isinstance(ids, list) or not ids or not all(_is_int(i) for i in ids):
+                return {'status': 400, 'error': 'ids must be a non-empty list of integers'}
+            records = Material.browse(list(dict.fromkeys(ids))).exists()
+            found = set(records.ids)
+            missing_ids = [i for i in dict.fromkeys(ids) if i not in found]
+        else:
+            material_types = [key for key, _label in Material._fields['material_type'].selection]
+            domain, error = _bulk_delete_domain(filter, material_types)
+            if error:
+                return {'status': 400, 'error': error}
+            records = Material.search(domain, order='id')
+
+        deleted = 0
+        for chunk in _chunks(records, chunk_size or len(records) or 1):
+            try:
+                chunk.unlink()
+                if chunk_size:
+                    request.env.cr.commit()
+            except Exception as e:
+                request.env.cr.rollback()
+                return {'status': 500, 'error': str(e), 'deleted': deleted if chunk_size else 0}
+            deleted += len(chunk)
+
+        return {
+            'status': 207 if missing_ids else 200,
+            'deleted': deleted,
+            'missing_ids': missing_ids,
+        }
+
     @http.route('/api/materials/delete/<int:material_id>', type='http', auth='none', methods=['GET'], csrf=False, cors='*')
     @jwt_required
     def delete_material(self, material_id, **kwargs):
         material = request.env['material.material'].sudo().browse(material_id)
         if not material.exists():
-            return Response(
-                json.dumps({'status': 404, 'error': "Material not found"}),
-                status=404,
-                content_type='application/json'
-            )
+            return json_response({'status': 404, 'error': "Material not found"}, status=404)
         try:
             material.unlink()
-            return Response(
-                json.dumps({'status': 200, 'data': "Material deleted successfully"}),
-                status=200,
-                content_type='application/json'
-            )
+            return json_response({'status': 200, 'data': "Material deleted successfully"}, status=200)
         
         except Exception as e:
             request.env.cr.rollback()
-            return Response(
-                json.dumps({'status': 500, 'error': str(e)}),
-                status=500,
-                content_type='application/json'
-            )
\ No newline at end of file
+            return json_response({'status': 500, 'error': str(e)}, status=500)
\ No newline at end of file
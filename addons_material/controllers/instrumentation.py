@@ -0,0 +1,150 @@
+import logging
+import threading
+import time
+from bisect import bisect_left
+from werkzeug.wrappers import Response as WerkzeugResponse
+
+_logger = logging.getLogger(__name__)
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+JWT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        # buckets are cumulative "less or equal" bounds, the last slot is +Inf
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Metrics:
+    """Per-route request metrics of the material API, rendered in Prometheus text format.
+
+    Values are kept per process: with prefork workers every worker exposes
+    its own series, which is why scrapes should go through each worker or
+    be aggregated on the Prometheus side.
+    """
+
+    HISTOGRAMS = {
+        'material_api_request_duration_seconds': ('Wall time of API requests.', DURATION_BUCKETS),
+        'material_api_sql_queries': ('SQL queries issued per API request.', QUERY_BUCKETS),
+        'material_api_sql_duration_seconds': ('Time spent in SQL per API request.', DURATION_BUCKETS),
+        'material_api_response_bytes': ('Size of non-streamed API response bodies.', SIZE_BUCKETS),
+        'material_api_jwt_decode_seconds': ('Time spent authenticating the JWT.', JWT_BUCKETS),
+    }
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._requests = {}
+
+    def observe(self, route, status, wall_time, sql_count, sql_time, size, jwt_time):
+        values = {
+            'material_api_request_duration_seconds': wall_time,
+            'material_api_sql_queries': sql_count,
+            'material_api_sql_duration_seconds': sql_time,
+            'material_api_response_bytes': size,
+            'material_api_jwt_decode_seconds': jwt_time,
+        }
+        with self._lock:
+            for name, value in values.items():
+                if value is None:
+                    continue
+                key = (name, route)
+                if key not in self._histograms:
+                    self._histograms[key] = Histogram(self.HISTOGRAMS[name][1])
+                self._histograms[key].observe(value)
+            self._requests[(route, status)] = self._requests.get((route, status), 0) + 1
+
+    def render(self, extra_counters=None):
+        """Return the metrics in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            for name, (help_text, _buckets) in self.HISTOGRAMS.items():
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} histogram')
+                for (metric, route), histogram in sorted(self._histograms.items()):
+                    if metric != name:
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets + ('+Inf',), histogram.counts):
+                        cumulative += count
+                        lines.append(f'{name}_bucket{{route="{route}",le="{bound}"}} {cumulative}')
+                    lines.append(f'{name}_sum{{route="{route}"}} {histogram.sum}')
+                    lines.append(f'{name}_count{{route="{route}"}} {histogram.count}')
+            lines.append('# HELP material_api_requests_total API requests by route and status.')
+            lines.append('# TYPE material_api_requests_total counter')
+            for (route, status), count in sorted(self._requests.items()):
+                lines.append(f'material_api_requests_total{{route="{route}",status="{status}"}} {count}')
+        for name, (help_text, value) in (extra_counters or {}).items():
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} counter')
+            lines.append(f'{name} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+metrics = Metrics()
+
+
+def _sql_stats(cr):
+    """Return ``(query count, query time)`` of the current thread so far."""
+    thread = threading.current_thread()
+    if hasattr(thread, 'query_count'):
+        return thread.query_count, thread.query_time
+    return getattr(cr, 'sql_log_count', 0), 0.0
+
+
+class RequestTracker:
+    """Measures one API request: wall time, SQL, JWT authentication and response size."""
+
+    def __init__(self, route, cr):
+        self.route = route
+        self.cr = cr
+        self.started = time.perf_counter()
+        self.sql_count_start, self.sql_time_start = _sql_stats(cr)
+        self.jwt_time = None
+
+    def finish(self, response):
+        """Record the request; a streamed response is recorded once its body has been sent."""
+        wall_time, sql_count, sql_time = self._elapsed()
+        size = None
+        if isinstance(response, WerkzeugResponse):
+            status = response.status_code
+            # headers go out before a streamed body is produced: they can only time the setup
+            app_timing = f'app;dur={wall_time * 1000:.1f}' + (';desc="setup"' if response.is_streamed else '')
+            server_timing = [app_timing, f'db;dur={sql_time * 1000:.1f};desc="{sql_count} queries"']
+            if self.jwt_time is not None:
+                server_timing.append(f'jwt;dur={self.jwt_time * 1000:.2f}')
+            response.headers['Server-Timing'] = ', '.join(server_timing)
+            if response.is_streamed:
+                response.call_on_close(lambda: self._record(status, *self._elapsed(), None))
+                return response
+            size = response.calculate_content_length()
+        else:
+            # type='json' routes return a dict that Odoo encodes afterwards
+            status = response.get('status', 200) if isinstance(response, dict) else 200
+        self._record(status, wall_time, sql_count, sql_time, size)
+        return response
+
+    def _elapsed(self):
+        """Return ``(wall time, query count, query time)`` since the tracker was created."""
+        sql_count, sql_time = _sql_stats(self.cr)
+        return time.perf_counter() - self.started, sql_count - self.sql_count_start, sql_time - self.sql_time_start
+
+    def _record(self, status, wall_time, sql_count, sql_time, size):
+        metrics.observe(self.route, status, wall_time, sql_count, sql_time, size, self.jwt_time)
+        _logger.info(
+            "material_api route=%s status=%s wall_ms=%.1f sql_count=%d sql_ms=%.1f bytes=%s jwt_ms=%s",
+            self.route, status, wall_time * 1000, sql_count, sql_time * 1000,
+            size if size is not None else '-',
+            '%.2f' % (self.jwt_time * 1000) if self.jwt_time is not None else '-',
+        )
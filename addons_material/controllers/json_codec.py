@@ -0,0 +1,52 @@
+"""JSON encoding for the material API.
+
+Uses orjson or ujson when one of them is installed and falls back to the
+standard library otherwise. This module does not import Odoo so that the
+serialization benchmark can load it on its own.
+"""
+import datetime
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+BACKEND = 'orjson' if orjson else 'ujson' if ujson else 'json'
+
+
+def _default(value):
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    if isinstance(value, bytes):
+        return value.decode()
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+
+def _stdlib_dumps(payload):
+    return json.dumps(payload, default=_default, separators=(',', ':')).encode()
+
+
+def dumps(payload):
+    """Serialize ``payload`` to JSON bytes.
+
+    ``search_read`` rows are encoded as they are: Many2one ``(id, name)``
+    tuples become arrays and Monetary values plain numbers, without copying
+    the rows first.
+    """
+    if orjson is not None:
+        return orjson.dumps(payload, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    if ujson is not None:
+        try:
+            return ujson.dumps(payload, ensure_ascii=False).encode()
+        except (TypeError, OverflowError):
+            # ujson has no hook for dates and other Odoo values
+            pass
+    return _stdlib_dumps(payload)
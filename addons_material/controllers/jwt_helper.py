@@ -1,20 +1,118 @@
 import jwt
 import datetime
-import json
+import logging
+import hashlib
 import os
+import threading
+import time
+from collections import OrderedDict
 from jwt import ExpiredSignatureError, InvalidTokenError
-from odoo.http import request, Response
+import odoo
+from odoo import api, SUPERUSER_ID
+from odoo.http import request
+from werkzeug.wrappers import Response as WerkzeugResponse
+from odoo.addons.addons_material.controllers.response_helper import json_response
+from odoo.addons.addons_material.controllers.instrumentation import RequestTracker
+from odoo.addons.addons_material.controllers.rate_limit import rate_limiter
+from odoo.addons.addons_material.controllers.response_cache import pin_generation
 from functools import wraps
 from dotenv import load_dotenv
 
+_logger = logging.getLogger(__name__)
+
 load_dotenv()
 SECRET_KEY = os.getenv("SECRET_KEY", "fallback-secret")
+# lifetime (seconds) of access tokens; clients renew them with their refresh token
+JWT_ACCESS_TOKEN_TTL = int(os.getenv("JWT_ACCESS_TOKEN_TTL", "900"))
+JWT_CACHE_SIZE = int(os.getenv("JWT_CACHE_SIZE", "4096"))
+# upper bound on how long a cached user "active" flag is trusted
+JWT_CACHE_TTL = int(os.getenv("JWT_CACHE_TTL", "300"))
+# seconds between two checks for sessions revoked through another worker
+JWT_REVOCATION_CHECK_INTERVAL = int(os.getenv("JWT_REVOCATION_CHECK_INTERVAL", "5"))
+
+
+class TokenCache:
+    """Bounded LRU of verified tokens.
+
+    Entries are keyed by the SHA-256 digest of the raw token and hold
+    ``(expires_at, user_id, active, session_id)``; an entry expires with its
+    token, or after ``ttl`` seconds so a deactivated user is eventually
+    rejected. Entries of a revoked session are dropped by ``discard_sessions``.
+    """
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        # revocation generation the entries were last checked against, and when
+        self.revocation_generation = None
+        self.revocation_checked = 0.0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= time.time():
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def set(self, key, token_exp, user_id, active, session_id=None):
+        expires_at = min(token_exp, time.time() + self.ttl)
+        with self._lock:
+            self._entries[key] = (expires_at, user_id, active, session_id)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def session_ids(self):
+        with self._lock:
+            return {entry[3] for entry in self._entries.values() if entry[3]}
+
+    def discard_sessions(self, session_ids):
+        """Forget the tokens minted for ``session_ids``."""
+        if not session_ids:
+            return
+        with self._lock:
+            for key in [key for key, entry in self._entries.items() if entry[3] in session_ids]:
+                del self._entries[key]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+            }
+
+
+token_cache = TokenCache(JWT_CACHE_SIZE, JWT_CACHE_TTL)
+
 
-def generate_jwt(user_id):
+def get_token_cache_stats():
+    return token_cache.stats()
+
+def generate_jwt(user_id, session_id=None):
+    """Return a short-lived access token; ``session_id`` ties it to a revocable refresh token session."""
     payload = {
         'user_id': user_id,
-        'exp': datetime.datetime.utcnow() + datetime.timedelta(hours=2)
+        'token_type': 'access',
+        'exp': datetime.datetime.utcnow() + datetime.timedelta(seconds=JWT_ACCESS_TOKEN_TTL)
     }
+    if session_id:
+        payload['rid'] = session_id
     return jwt.encode(payload, SECRET_KEY, algorithm='HS256')
 
 def decode_jwt(token):
@@ -26,22 +124,92 @@ def decode_jwt(token):
     except InvalidTokenError:
         return {'error': 'Invalid token', 'status': 401}
 
-def jwt_required(func):
-    @wraps(func)
-    def wrapper(*args, **kwargs):
-        auth_header = request.httprequest.headers.get('Authorization')
-        if not auth_header:
-            return Response(json.dumps({'error': 'Missing token'}), status=401, content_type='application/json')
+def _sync_revocations():
+    """
+    Drop cached tokens of sessions revoked by any worker, at most every
+    JWT_REVOCATION_CHECK_INTERVAL seconds.
+
+    Reads through its own autocommit cursor so that the revoked sessions are
+    queried in a snapshot taken after the generation was read.
+    """
+    now = time.time()
+    if now < token_cache.revocation_checked + JWT_REVOCATION_CHECK_INTERVAL:
+        return
+    token_cache.revocation_checked = now
+    with odoo.registry(request.env.cr.dbname).cursor() as cr:
+        cr.autocommit(True)
+        Session = api.Environment(cr, SUPERUSER_ID, {})['material.api.refresh.token']
+        generation = Session._get_revocation_generation()
+        if generation == token_cache.revocation_generation:
+            return
+        token_cache.discard_sessions(Session._filter_revoked(token_cache.session_ids()))
+        token_cache.revocation_generation = generation
+
+
+def _authenticate():
+    """Check the bearer token of the request; return an error response, or None once ``request.uid`` is set."""
+    auth_header = request.httprequest.headers.get('Authorization')
+    if not auth_header:
+        return json_response({'error': 'Missing token'}, status=401)
 
-        token = auth_header.replace("Bearer ", "")
+    token = auth_header.replace("Bearer ", "")
+    cache_key = hashlib.sha256(token.encode()).digest()
+    _sync_revocations()
+    cached = token_cache.get(cache_key)
+    if cached:
+        _expires_at, user_id, active, _session_id = cached
+    else:
         result = decode_jwt(token)
 
         if isinstance(result, dict) and 'error' in result:
-            return Response(json.dumps({'error': result['error']}), status=result['status'], content_type='application/json')
+            return json_response({'error': result['error']}, status=result['status'])
+        if result.get('token_type', 'access') != 'access':
+            return json_response({'error': 'Invalid token'}, status=401)
 
         user_id = result.get('user_id')
-        request.uid = user_id
-        request.env.user = request.env['res.users'].sudo().browse(user_id)
+        user = request.env['res.users'].sudo().browse(user_id).exists()
+        active = bool(user.active)
+        if active and result.get('rid'):
+            active = not request.env['material.api.refresh.token'].sudo()._is_revoked(result['rid'])
+        token_cache.set(cache_key, result['exp'], user_id, active, result.get('rid'))
+
+    if not active:
+        return json_response({'error': 'Invalid token'}, status=401)
+
+    request.uid = user_id
+    request.env.user = request.env['res.users'].sudo().browse(user_id)
+    return None
+
+def jwt_required(func):
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        tracker = RequestTracker(func.__name__, request.env.cr)
+        if getattr(func, 'material_api_cached', False):
+            pin_generation(request.env)
+        jwt_started = time.perf_counter()
+        error = _authenticate()
+        tracker.jwt_time = time.perf_counter() - jwt_started
+        if error is not None:
+            return tracker.finish(error)
 
-        return func(*args, **kwargs)
+        rate_class = getattr(func, 'material_rate_class', 'light')
+        retry_after, slot = rate_limiter.admit(rate_class, request.uid, request.httprequest.remote_addr)
+        if retry_after:
+            if request._request_type == 'json':
+                # Odoo would serialize a Response returned by a type='json' route as a string
+                return tracker.finish({'status': 429, 'error': 'Too many requests', 'retry_after': retry_after})
+            return tracker.finish(json_response(
+                {'status': 429, 'error': 'Too many requests'}, status=429,
+                headers=[('Retry-After', str(retry_after))]))
+        try:
+            response = func(*args, **kwargs)
+        except Exception:
+            rate_limiter.release(slot)
+            raise
+        if isinstance(response, WerkzeugResponse) and response.is_streamed:
+            # a streamed body is produced while it is sent: hold the slot until then
+            response.call_on_close(lambda: rate_limiter.release(slot))
+        else:
+            rate_limiter.release(slot)
+        return tracker.finish(response)
     return wrapper
\ No newline at end of file
@@ -0,0 +1,305 @@
+import datetime
+import logging
+import os
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from itertools import islice
+from dotenv import load_dotenv
+from odoo.addons.addons_material.controllers.response_cache import current_generation
+
+_logger = logging.getLogger(__name__)
+
+load_dotenv()
+MATERIAL_SNAPSHOT = os.getenv("MATERIAL_SNAPSHOT", "0") not in ("0", "false", "False")
+# rows written this many seconds before the newest row seen are read again on
+# every update, to catch transactions that committed after a later one
+MATERIAL_SNAPSHOT_OVERLAP = int(os.getenv("MATERIAL_SNAPSHOT_OVERLAP", "300"))
+# above this many changed rows a full rebuild is cheaper than merging
+MAX_DELTA_ROWS = 5000
+# above this many rows deleted or inserted before the last id, a full rebuild
+# is cheaper than patching: each of them moves the tail of every column
+MAX_SHIFTED_ROWS = 200
+
+EMPTY = array('q')
+
+
+class Snapshot:
+    """Immutable, columnar copy of the material table sorted by id.
+
+    Every field is a column (an ``array`` for the numeric ones) and rows are
+    addressed by position. ``code``, ``material_type`` and ``supplier_id``
+    are indexed by id, so that deleting or inserting a row does not renumber
+    them; positions are found by bisection since the columns are sorted.
+    """
+
+    COLUMNS = ('ids', 'names', 'codes', 'material_types', 'buy_prices', 'supplier_ids', 'write_dates')
+
+    def __init__(self, generation, entries, suppliers, types, tombstone_id):
+        # entries are (id, name, code, material_type, buy_price, supplier_id, write_date) tuples, sorted by id
+        self.generation = generation
+        self.suppliers = suppliers
+        self.types = types
+        self.tombstone_id = tombstone_id
+        self.type_numbers = {material_type: number for number, material_type in enumerate(types)}
+        self.ids = array('q')
+        self.names = []
+        self.codes = []
+        self.material_types = array('b')
+        self.buy_prices = array('d')
+        self.supplier_ids = array('q')
+        self.write_dates = []
+        self.code_index = {}
+        self.type_index = {}
+        self.supplier_index = {}
+        for material_id, name, code, material_type, buy_price, supplier_id, write_date in entries:
+            self.ids.append(material_id)
+            self.names.append(name)
+            self.codes.append(code)
+            self.material_types.append(self.type_numbers[material_type])
+            self.buy_prices.append(buy_price or 0.0)
+            self.supplier_ids.append(supplier_id or 0)
+            self.write_dates.append(write_date)
+            self.code_index[code] = material_id
+            self.type_index.setdefault(material_type, array('q')).append(material_id)
+            self.supplier_index.setdefault(supplier_id or 0, array('q')).append(material_id)
+        self.last_write = max(self.write_dates) if self.write_dates else None
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _position(self, material_id):
+        """Position of ``material_id``, or None when it is not in the snapshot."""
+        position = bisect_left(self.ids, material_id)
+        if position < len(self.ids) and self.ids[position] == material_id:
+            return position
+        return None
+
+    def patched(self, generation, changed, deleted, suppliers, tombstone_id):
+        """
+        Return a snapshot at ``generation`` with the ``changed`` entries
+        (keyed by id) applied and the ``deleted`` ids removed.
+
+        Columns are copied (a C-level copy) and patched row by row, so the cost
+        in Python is proportional to the changes, not to the table. Returns
+        None when more than MAX_SHIFTED_ROWS rows would have to be removed or
+        inserted before the end, since each of these moves the column tails.
+        """
+        removed = [material_id for material_id in deleted
+                   if material_id not in changed and self._position(material_id) is not None]
+        last_id = self.ids[-1] if self.ids else 0
+        shifted = len(removed) + sum(
+            1 for material_id in changed if material_id < last_id and self._position(material_id) is None)
+        if shifted > MAX_SHIFTED_ROWS:
+            return None
+
+        patched = object.__new__(Snapshot)
+        patched.__dict__.update(self.__dict__)
+        patched.generation = generation
+        patched.suppliers = suppliers
+        patched.tombstone_id = tombstone_id
+        if not changed and not removed:
+            # the generation also moves on writes that did not commit yet: nothing to copy
+            return patched
+        for column in self.COLUMNS:
+            setattr(patched, column, getattr(self, column)[:])
+        patched.code_index = dict(self.code_index)
+        patched.type_index = dict(self.type_index)
+        patched.supplier_index = dict(self.supplier_index)
+        patched._copied = set()
+
+        for material_id in sorted(removed, reverse=True):
+            position = patched._position(material_id)
+            patched._unindex(position)
+            for column in self.COLUMNS:
+                del getattr(patched, column)[position]
+        for material_id in sorted(changed):
+            _id, name, code, material_type, buy_price, supplier_id, write_date = changed[material_id]
+            position = patched._position(material_id)
+            if position is None:
+                position = bisect_left(patched.ids, material_id)
+                for column in self.COLUMNS:
+                    getattr(patched, column).insert(position, 0 if isinstance(getattr(patched, column), array) else None)
+                patched.ids[position] = material_id
+            else:
+                patched._unindex(position)
+            patched.names[position] = name
+            patched.codes[position] = code
+            patched.material_types[position] = self.type_numbers[material_type]
+            patched.buy_prices[position] = buy_price or 0.0
+            patched.supplier_ids[position] = supplier_id or 0
+            patched.write_dates[position] = write_date
+            patched._index(position)
+        del patched._copied
+        write_dates = [entry[6] for entry in changed.values()]
+        if self.last_write:
+            write_dates.append(self.last_write)
+        patched.last_write = max(write_dates) if write_dates else None
+        return patched
+
+    def _own(self, index, key):
+        # index arrays are shared with the snapshot this one was patched from: copy before changing
+        values = index.get(key)
+        if values is None:
+            values = index[key] = array('q')
+            self._copied.add(id(values))
+        elif id(values) not in self._copied:
+            values = index[key] = values[:]
+            self._copied.add(id(values))
+        return values
+
+    def _index(self, position):
+        material_id = self.ids[position]
+        self.code_index[self.codes[position]] = material_id
+        for index, key in ((self.type_index, self.types[self.material_types[position]]),
+                           (self.supplier_index, self.supplier_ids[position])):
+            values = self._own(index, key)
+            values.insert(bisect_left(values, material_id), material_id)
+
+    def _unindex(self, position):
+        material_id = self.ids[position]
+        if self.code_index.get(self.codes[position]) == material_id:
+            del self.code_index[self.codes[position]]
+        for index, key in ((self.type_index, self.types[self.material_types[position]]),
+                           (self.supplier_index, self.supplier_ids[position])):
+            values = self._own(index, key)
+            del values[bisect_left(values, material_id)]
+
+    def entry(self, position):
+        """The row at ``position`` as a ``Material._read_snapshot_rows()`` tuple."""
+        return (self.ids[position], self.names[position], self.codes[position],
+                self.types[self.material_types[position]], self.buy_prices[position],
+                self.supplier_ids[position] or False, self.write_dates[position])
+
+    def select(self, after=0, limit=None, material_type=None, supplier_id=None):
+        """Positions of the rows with an id above ``after`` matching the filters, in id order."""
+        if material_type is None and supplier_id is None:
+            start = bisect_right(self.ids, after)
+            return range(start, len(self.ids) if limit is None else min(start + limit, len(self.ids)))
+        if material_type is not None:
+            index = self.type_index.get(material_type, EMPTY)
+        else:
+            index = self.supplier_index.get(supplier_id, EMPTY)
+        positions = map(self._position, islice(index, bisect_right(index, after), None))
+        if material_type is not None and supplier_id is not None:
+            positions = (position for position in positions if self.supplier_ids[position] == supplier_id)
+        return list(islice(positions, limit))
+
+    def positions_by_ids(self, material_ids):
+        positions = (self._position(material_id) for material_id in material_ids)
+        return [position for position in positions if position is not None]
+
+    def positions_by_codes(self, codes):
+        return [self._position(self.code_index[code]) for code in codes if code in self.code_index]
+
+    def rows(self, positions, field_names):
+        """Rows at ``positions`` shaped like ``search_read(field_names)`` returns them."""
+        getters = {
+            'name': self.names.__getitem__,
+            'code': self.codes.__getitem__,
+            'material_type': lambda position: self.types[self.material_types[position]],
+            'buy_price': self.buy_prices.__getitem__,
+            'supplier_id': lambda position: self.suppliers.get(self.supplier_ids[position], False),
+        }
+        getters = [(field_name, getters[field_name]) for field_name in field_names if field_name != 'id']
+        rows = []
+        for position in positions:
+            row = {'id': self.ids[position]}
+            for field_name, getter in getters:
+                row[field_name] = getter(position)
+            rows.append(row)
+        return rows
+
+    def validator(self, positions):
+        """``(count, max(write_date))`` of the rows at ``positions``, like ``_get_listing_validator``."""
+        write_dates = [self.write_dates[position] for position in positions]
+        return len(write_dates), max(write_dates) if write_dates else None
+
+
+class MaterialSnapshot:
+    """Per-worker read replica of ``material.material`` of each database, for the listing and lookup routes.
+
+    The snapshot is tagged with the API cache generation it was taken at.
+    When a read finds another generation, i.e. materials were created,
+    written or deleted by any worker, the snapshot is brought up to date from
+    the ``write_date`` change feed and the tombstones instead of being
+    reloaded. Renaming a supplier does not bump the generation, so supplier
+    names are only refreshed with the materials that use them.
+    """
+
+    def __init__(self, enabled):
+        self.enabled = enabled
+        # generations are per database: one snapshot per database name
+        self._snapshots = {}
+        self._lock = threading.Lock()
+
+    def clear(self):
+        with self._lock:
+            self._snapshots = {}
+
+    def get(self, env):
+        """Return a snapshot current with the data visible to ``env``."""
+        dbname = env.cr.dbname
+        generation = current_generation(env)
+        snapshot = self._snapshots.get(dbname)
+        if snapshot is None or snapshot.generation != generation:
+            with self._lock:
+                snapshot = self._snapshots.get(dbname)
+                if snapshot is None:
+                    snapshot = self._build(env, generation)
+                elif snapshot.generation != generation:
+                    snapshot = self._update(env, snapshot, generation)
+                self._snapshots[dbname] = snapshot
+        return snapshot
+
+    def _build(self, env, generation):
+        Material = env['material.material'].sudo()
+        tombstone_id = env['material.tombstone'].sudo().search([], order='id desc', limit=1).id or 0
+        entries = Material._read_snapshot_rows()
+        types = [value for value, _label in Material._fields['material_type'].selection]
+        suppliers = self._supplier_names(env, {entry[5] for entry in entries})
+        _logger.info("Material snapshot built with %d rows", len(entries))
+        return Snapshot(generation, entries, suppliers, types, tombstone_id)
+
+    def _update(self, env, snapshot, generation):
+        Material = env['material.material'].sudo()
+        since = snapshot.last_write - datetime.timedelta(seconds=MATERIAL_SNAPSHOT_OVERLAP) \
+            if snapshot.last_write else None
+        changed_ids = Material._get_changes(since, 0, limit=MAX_DELTA_ROWS + 1)
+        if len(changed_ids) > MAX_DELTA_ROWS:
+            return self._build(env, generation)
+        tombstones = env['material.tombstone'].sudo().search_read(
+            [('id', '>', snapshot.tombstone_id)], ['material_id'], order='id')
+
+        changed = {entry[0]: entry for entry in Material._read_snapshot_rows(changed_ids)}
+        # rows within the overlap window come back on every update: keep only real changes
+        positions = {material_id: snapshot._position(material_id) for material_id in changed}
+        changed = {
+            material_id: entry for material_id, entry in changed.items()
+            if positions[material_id] is None or entry != snapshot.entry(positions[material_id])
+        }
+        deleted = {tombstone['material_id'] for tombstone in tombstones}
+        suppliers = snapshot.suppliers
+        new_suppliers = {entry[5] for entry in changed.values()} - {False}
+        if new_suppliers:
+            suppliers = dict(suppliers)
+            suppliers.update(self._supplier_names(env, new_suppliers))
+        tombstone_id = tombstones[-1]['id'] if tombstones else snapshot.tombstone_id
+        updated = snapshot.patched(generation, changed, deleted, suppliers, tombstone_id)
+        if updated is None:
+            return self._build(env, generation)
+
+        # rows whose insertion was rolled back vanish without a tombstone
+        if len(updated) != Material.search_count([]):
+            return self._build(env, generation)
+        return updated
+
+    def _supplier_names(self, env, supplier_ids):
+        supplier_ids = [supplier_id for supplier_id in supplier_ids if supplier_id]
+        return {
+            supplier_id: (supplier_id, name)
+            for supplier_id, name in env['res.partner'].sudo().browse(supplier_ids).name_get()
+        }
+
+
+material_snapshot = MaterialSnapshot(MATERIAL_SNAPSHOT)
@@ -0,0 +1,191 @@
+import logging
+import math
+import os
+import random
+import sqlite3
+import threading
+import time
+from dotenv import load_dotenv
+from odoo.tools import config
+
+_logger = logging.getLogger(__name__)
+
+load_dotenv()
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "1") not in ("0", "false", "False")
+# token bucket per (user, client IP): (tokens refilled per second, bucket size)
+BUDGETS = {
+    'light': (float(os.getenv("RATE_LIMIT_LIGHT_RATE", "50")), float(os.getenv("RATE_LIMIT_LIGHT_BURST", "200"))),
+    'heavy': (float(os.getenv("RATE_LIMIT_HEAVY_RATE", "5")), float(os.getenv("RATE_LIMIT_HEAVY_BURST", "50"))),
+}
+# in-flight heavy requests allowed per (user, client IP)
+HEAVY_CONCURRENCY = int(os.getenv("RATE_LIMIT_HEAVY_CONCURRENCY", "4"))
+# a slot left behind by a killed worker is reclaimed after this many seconds
+SLOT_TTL = int(os.getenv("RATE_LIMIT_SLOT_TTL", "300"))
+# idle buckets are forgotten after this many seconds
+BUCKET_TTL = 3600
+
+
+def heavy_route(func):
+    """Mark a route as heavy: it gets the heavy rate budget and concurrency cap in ``jwt_required``."""
+    func.material_rate_class = 'heavy'
+    return func
+
+
+def _refill(tokens, updated, now, rate, burst):
+    """Take one token from a bucket; return ``(tokens left, seconds to wait or 0)``."""
+    tokens = burst if tokens is None else min(burst, tokens + (now - updated) * rate)
+    if tokens >= 1:
+        return tokens - 1, 0
+    return tokens, (1 - tokens) / rate if rate > 0 else SLOT_TTL
+
+
+class MemoryStore:
+    """Limiter state of a single process (threaded server)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = {}
+        self._slots = {}
+        self._next_slot = 0
+
+    def consume(self, key, rate, burst):
+        now = time.time()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (None, now))
+            tokens, retry_after = _refill(tokens, updated, now, rate, burst)
+            self._buckets[key] = (tokens, now)
+            if random.random() < 0.01:
+                self._buckets = {k: v for k, v in self._buckets.items() if v[1] > now - BUCKET_TTL}
+        return retry_after
+
+    def acquire(self, key, limit):
+        now = time.time()
+        with self._lock:
+            self._slots = {slot: v for slot, v in self._slots.items() if v[1] > now}
+            if sum(1 for slot_key, _expires in self._slots.values() if slot_key == key) >= limit:
+                return None
+            self._next_slot += 1
+            self._slots[self._next_slot] = (key, now + SLOT_TTL)
+            return self._next_slot
+
+    def release(self, slot):
+        with self._lock:
+            self._slots.pop(slot, None)
+
+    def reset(self):
+        with self._lock:
+            self._buckets.clear()
+            self._slots.clear()
+
+
+class SQLiteStore:
+    """Limiter state shared by the prefork workers of one host through a local SQLite file."""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+
+    def _connection(self):
+        # connections must not cross a fork, hence the pid check
+        if getattr(self._local, 'pid', None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=1, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            conn.execute("CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL, updated REAL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS slots (id INTEGER PRIMARY KEY, key TEXT, expires REAL)")
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return self._local.conn
+
+    def _transaction(self, func):
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = func(conn, time.time())
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        return result
+
+    def consume(self, key, rate, burst):
+        def consume(conn, now):
+            row = conn.execute("SELECT tokens, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+            tokens, retry_after = _refill(row and row[0], row[1] if row else now, now, rate, burst)
+            conn.execute("INSERT OR REPLACE INTO buckets VALUES (?, ?, ?)", (key, tokens, now))
+            if random.random() < 0.01:
+                conn.execute("DELETE FROM buckets WHERE updated < ?", (now - BUCKET_TTL,))
+            return retry_after
+        return self._transaction(consume)
+
+    def acquire(self, key, limit):
+        def acquire(conn, now):
+            conn.execute("DELETE FROM slots WHERE expires < ?", (now,))
+            in_flight = conn.execute("SELECT count(*) FROM slots WHERE key = ?", (key,)).fetchone()[0]
+            if in_flight >= limit:
+                return None
+            return conn.execute("INSERT INTO slots (key, expires) VALUES (?, ?)", (key, now + SLOT_TTL)).lastrowid
+        return self._transaction(acquire)
+
+    def release(self, slot):
+        self._connection().execute("DELETE FROM slots WHERE id = ?", (slot,))
+
+    def reset(self):
+        def reset(conn, now):
+            conn.execute("DELETE FROM buckets")
+            conn.execute("DELETE FROM slots")
+        self._transaction(reset)
+
+
+class RateLimiter:
+    """Token-bucket rate limiting and concurrency admission keyed by (user, client IP).
+
+    Store errors never block traffic: the request is admitted and a warning
+    is logged.
+    """
+
+    def __init__(self, store):
+        self.store = store
+
+    def admit(self, rate_class, user_id, ip):
+        """Return ``(retry_after, slot)``; a positive ``retry_after`` means the request is refused."""
+        if not RATE_LIMIT_ENABLED:
+            return 0, None
+        key = f'{rate_class}:{user_id}:{ip}'
+        rate, burst = BUDGETS[rate_class]
+        try:
+            retry_after = self.store.consume(key, rate, burst)
+            if retry_after:
+                return math.ceil(retry_after), None
+            if rate_class != 'heavy':
+                return 0, None
+            slot = self.store.acquire(key, HEAVY_CONCURRENCY)
+            if slot is None:
+                return 1, None
+            return 0, slot
+        except sqlite3.Error:
+            _logger.warning("Rate limiter store unavailable, admitting request", exc_info=True)
+            return 0, None
+
+    def release(self, slot):
+        if slot is None:
+            return
+        try:
+            self.store.release(slot)
+        except sqlite3.Error:
+            _logger.warning("Could not release rate limiter slot %s", slot, exc_info=True)
+
+    def reset(self):
+        self.store.reset()
+
+
+def _default_store():
+    path = os.getenv("RATE_LIMIT_STORE")
+    if not path and config.get('workers'):
+        path = os.path.join(config['data_dir'], 'material_rate_limit.sqlite')
+    if path and path != 'memory':
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        return SQLiteStore(path)
+    return MemoryStore()
+
+
+rate_limiter = RateLimiter(_default_store())
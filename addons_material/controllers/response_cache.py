@@ -0,0 +1,169 @@
+import datetime
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from dotenv import load_dotenv
+from odoo.http import request
+
+_logger = logging.getLogger(__name__)
+
+load_dotenv()
+CACHE_SIZE = int(os.getenv("MATERIAL_API_CACHE_SIZE", "256"))
+CACHE_DIR = os.getenv("MATERIAL_API_CACHE_DIR")
+
+
+def cached_route(func):
+    """Mark a route that serves data tagged with the API cache generation.
+
+    ``jwt_required`` reads the generation of such routes before any other
+    query (see ``pin_generation``).
+    """
+    func.material_api_cached = True
+    return func
+
+
+def pin_generation(env):
+    """Read the API cache generation as the first query of the request.
+
+    Cursors are REPEATABLE READ: the first query fixes the data the request
+    sees, and a generation read after it may already count changes that data
+    does not contain, which would cache stale rows under the new generation.
+    """
+    request.material_api_generation = env['material.material'].sudo()._get_api_cache_generation()
+
+
+def current_generation(env):
+    """Return the generation pinned for the current request, or read it now."""
+    generation = getattr(request, 'material_api_generation', None) if request else None
+    if generation is None:
+        generation = env['material.material'].sudo()._get_api_cache_generation()
+    return generation
+
+
+class ResponseCache:
+    """Cache of serialized API responses of one database, shared by all requests of a worker.
+
+    Entries are ``(body, etag, last_modified, content_encoding)`` tuples
+    tagged with the generation (see ``Material._get_api_cache_generation()``)
+    they were computed under; ``body`` is stored compressed with
+    ``content_encoding`` when set. Every worker reads the generation once per lookup and
+    drops its entries when it moved, which keeps multi-worker deployments
+    coherent. When ``cache_dir`` is set,
+    entries are also written there so that workers can share them.
+    """
+
+    def __init__(self, maxsize, cache_dir=None):
+        self.maxsize = maxsize
+        self.cache_dir = cache_dir
+        self.generation = None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def sync(self, generation):
+        """Drop the entries of older generations and return ``generation``."""
+        with self._lock:
+            if generation != self.generation:
+                self._entries.clear()
+                self.generation = generation
+                stale = True
+            else:
+                stale = False
+        if stale and self.cache_dir:
+            self._purge_files(generation)
+        return generation
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry
+            generation = self.generation
+        entry = self._read_file(generation, key) if self.cache_dir else None
+        if entry is not None:
+            self._store(generation, key, entry)
+        return entry
+
+    def set(self, generation, key, body, etag, last_modified, content_encoding=None):
+        """Store an entry computed under ``generation``; stale results are dropped."""
+        entry = (body, etag, last_modified, content_encoding)
+        if self._store(generation, key, entry) and self.cache_dir:
+            self._write_file(generation, key, entry)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.generation = None
+
+    def _store(self, generation, key, entry):
+        with self._lock:
+            if generation != self.generation:
+                return False
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+            return True
+
+    def _path(self, generation, key):
+        digest = hashlib.sha1(key.encode()).hexdigest()
+        return os.path.join(self.cache_dir, f'{generation}-{digest}.cache')
+
+    def _read_file(self, generation, key):
+        try:
+            with open(self._path(generation, key), 'rb') as f:
+                meta = json.loads(f.readline())
+                last_modified = meta['last_modified']
+                if last_modified:
+                    last_modified = datetime.datetime.fromisoformat(last_modified)
+                return f.read(), meta['etag'], last_modified, meta.get('content_encoding')
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _write_file(self, generation, key, entry):
+        body, etag, last_modified, content_encoding = entry
+        meta = json.dumps(
+            {'etag': etag, 'last_modified': last_modified, 'content_encoding': content_encoding}, default=str)
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir)
+            with os.fdopen(fd, 'wb') as f:
+                f.write(meta.encode() + b'\n')
+                f.write(body)
+            os.replace(tmp_path, self._path(generation, key))
+        except OSError:
+            _logger.warning("Could not write material API cache entry", exc_info=True)
+
+    def _purge_files(self, generation):
+        prefix = f'{generation}-'
+        for name in os.listdir(self.cache_dir):
+            if name.endswith('.cache') and not name.startswith(prefix):
+                try:
+                    os.unlink(os.path.join(self.cache_dir, name))
+                except OSError:
+                    pass
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_response_cache(dbname):
+    """Return the response cache of database ``dbname``.
+
+    Generations are per database, so each one gets its own entries and, with
+    MATERIAL_API_CACHE_DIR, its own subdirectory.
+    """
+    cache = _caches.get(dbname)
+    if cache is None:
+        with _caches_lock:
+            cache = _caches.get(dbname)
+            if cache is None:
+                cache_dir = os.path.join(CACHE_DIR, dbname) if CACHE_DIR else None
+                cache = _caches[dbname] = ResponseCache(CACHE_SIZE, cache_dir)
+    return cache
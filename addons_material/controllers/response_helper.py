@@ -0,0 +1,93 @@
+import os
+import zlib
+from dotenv import load_dotenv
+from odoo.http import Response, request
+from odoo.addons.addons_material.controllers.json_codec import dumps
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+load_dotenv()
+API_COMPRESSION = os.getenv("API_COMPRESSION", "1") not in ("0", "false", "False")
+# bodies smaller than this are sent as they are: compressing them costs more than it saves
+API_COMPRESSION_MIN_SIZE = int(os.getenv("API_COMPRESSION_MIN_SIZE", "1024"))
+API_GZIP_LEVEL = int(os.getenv("API_GZIP_LEVEL", "6"))
+API_BROTLI_QUALITY = int(os.getenv("API_BROTLI_QUALITY", "4"))
+
+ENCODINGS = ['br', 'gzip'] if brotli else ['gzip']
+
+
+def negotiate_encoding():
+    """Return the encoding preferred by the client's Accept-Encoding, or None for identity."""
+    if not API_COMPRESSION:
+        return None
+    return request.httprequest.accept_encodings.best_match(ENCODINGS)
+
+
+def _compressor(encoding):
+    """Return the ``(compress, flush, finish)`` functions of a streaming compressor."""
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=API_BROTLI_QUALITY)
+        return compressor.process, compressor.flush, compressor.finish
+    compressor = zlib.compressobj(API_GZIP_LEVEL, zlib.DEFLATED, 31)
+    return compressor.compress, lambda: compressor.flush(zlib.Z_SYNC_FLUSH), compressor.flush
+
+
+def _compress_stream(chunks, encoding):
+    # every chunk is flushed so that a streaming client still receives rows as they are produced
+    compress, flush, finish = _compressor(encoding)
+    for chunk in chunks:
+        data = compress(chunk) + flush()
+        if data:
+            yield data
+    yield finish()
+
+
+def compress_body(body, encoding):
+    """Return ``(body, encoding)``, compressed unless ``encoding`` is None or the body is too small to bother."""
+    if not encoding or len(body) < API_COMPRESSION_MIN_SIZE:
+        return body, None
+    compress, _flush, finish = _compressor(encoding)
+    return compress(body) + finish(), encoding
+
+
+def compress_response(response):
+    """Compress ``response`` with gzip or Brotli when the client accepts it.
+
+    Buffered bodies below API_COMPRESSION_MIN_SIZE are left alone; streamed
+    bodies, whose size is unknown, are compressed chunk by chunk.
+    """
+    if not API_COMPRESSION or response.status_code in (204, 304) or 'Content-Encoding' in response.headers:
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = negotiate_encoding()
+    if not encoding:
+        return response
+
+    if response.is_streamed:
+        response.response = _compress_stream(response.response, encoding)
+        response.headers.pop('Content-Length', None)
+    else:
+        body, encoding = compress_body(response.get_data(), encoding)
+        if not encoding:
+            return response
+        response.set_data(body)
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+
+def json_response(payload, status=200, headers=None, content_encoding=None):
+    """Build the JSON ``Response`` of an http route; ``payload`` may be pre-encoded bytes.
+
+    ``content_encoding`` marks ``payload`` as already compressed with it (see
+    ``compress_body``), so that cached bodies are not compressed again.
+    """
+    body = payload if isinstance(payload, bytes) else dumps(payload)
+    response = Response(body, status=status, content_type='application/json', headers=headers)
+    if content_encoding:
+        response.vary.add('Accept-Encoding')
+        response.headers['Content-Encoding'] = content_encoding
+        return response
+    return compress_response(response)
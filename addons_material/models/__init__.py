@@ -1,3 +1,5 @@
 # -*- coding: utf-8 -*-
 
-from . import models
\ No newline at end of file
+from . import models
+from . import material_import
+from . import api_token
\ No newline at end of file
@@ -0,0 +1,125 @@
+import hashlib
+import os
+import secrets
+from dotenv import load_dotenv
+
+from odoo import models, fields, api
+
+load_dotenv()
+# days a refresh token stays valid without being used
+REFRESH_TOKEN_DAYS = int(os.getenv("JWT_REFRESH_TOKEN_DAYS", "30"))
+
+# Bumped after a session is revoked; API workers compare its value with the
+# one their JWT cache was checked at (see controllers/jwt_helper.py).
+REVOCATION_SEQUENCE = 'material_api_token_revocation'
+
+
+def _hash_token(token):
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+class MaterialApiRefreshToken(models.Model):
+    """A login session of the REST API.
+
+    The session holds the hash of its current refresh token; every refresh
+    rotates the token in place, so the record id stays stable and can be
+    embedded in the access tokens (``rid`` claim) to revoke them together.
+    """
+    _name = 'material.api.refresh.token'
+    _description = 'Material API Refresh Token'
+
+    user_id = fields.Many2one(comodel_name="res.users", string="User", required=True, ondelete='cascade', index=True)
+    token_hash = fields.Char(string="Token Hash", required=True, index=True)
+    expires_at = fields.Datetime(string="Expires At", required=True)
+    revoked = fields.Boolean(string="Revoked", default=False)
+
+    _sql_constraints = [
+        ('unique_token_hash', 'unique(token_hash)', 'Refresh token hashes must be unique.'),
+    ]
+
+    def init(self):
+        self.env.cr.execute("CREATE SEQUENCE IF NOT EXISTS %s" % REVOCATION_SEQUENCE)
+
+    @api.model
+    def _issue(self, user_id):
+        """Open a session for ``user_id``; return ``(refresh token, session)``."""
+        token = secrets.token_urlsafe(32)
+        session = self.create({
+            'user_id': user_id,
+            'token_hash': _hash_token(token),
+            'expires_at': fields.Datetime.add(fields.Datetime.now(), days=REFRESH_TOKEN_DAYS),
+        })
+        return token, session
+
+    @api.model
+    def _rotate(self, token):
+        """
+        Exchange a valid refresh token for a new one.
+
+        Returns ``(new refresh token, session)``, or ``(None, empty recordset)``
+        when the token is unknown, already rotated, expired or revoked. The swap
+        is a single UPDATE, so two concurrent refreshes with the same token
+        cannot both succeed.
+        """
+        new_token = secrets.token_urlsafe(32)
+        self.env.cr.execute("""
+            UPDATE material_api_refresh_token
+               SET token_hash = %s,
+                   expires_at = (now() at time zone 'UTC') + %s * interval '1 day',
+                   write_date = (now() at time zone 'UTC')
+             WHERE token_hash = %s AND NOT revoked AND expires_at > (now() at time zone 'UTC')
+         RETURNING id
+        """, [_hash_token(new_token), REFRESH_TOKEN_DAYS, _hash_token(token)])
+        row = self.env.cr.fetchone()
+        self.invalidate_cache(['token_hash', 'expires_at'])
+        if not row:
+            return None, self.browse()
+        return new_token, self.browse(row[0])
+
+    @api.model
+    def _revoke(self, token):
+        """Revoke the session of ``token``; return it, or an empty recordset when none was found."""
+        session = self.search([('token_hash', '=', _hash_token(token)), ('revoked', '=', False)], limit=1)
+        if session:
+            session.revoked = True
+            self._signal_revocation()
+        return session
+
+    @api.model
+    def _signal_revocation(self):
+        """
+        Tell every worker to re-check its cached tokens, once this transaction commits.
+
+        Bumping before the commit would let a worker read the new value, find
+        no revoked session yet and consider itself up to date.
+        """
+        registry = self.pool
+
+        def bump():
+            with registry.cursor() as signal_cr:
+                signal_cr.execute("SELECT nextval('%s')" % REVOCATION_SEQUENCE)
+
+        self.env.cr.postcommit.add(bump)
+
+    @api.model
+    def _get_revocation_generation(self):
+        self.env.cr.execute("SELECT last_value, is_called FROM %s" % REVOCATION_SEQUENCE)
+        last_value, is_called = self.env.cr.fetchone()
+        return last_value if is_called else 0
+
+    @api.model
+    def _filter_revoked(self, session_ids):
+        """Return the ids among ``session_ids`` of sessions that are revoked or gone."""
+        if not session_ids:
+            return set()
+        sessions = self.browse(list(session_ids)).exists()
+        return set(session_ids) - set(sessions.filtered(lambda session: not session.revoked).ids)
+
+    @api.model
+    def _is_revoked(self, session_id):
+        return bool(self._filter_revoked({session_id}))
+
+    @api.autovacuum
+    def _gc_refresh_tokens(self):
+        """Delete expired sessions; revoked ones go when they would have expired."""
+        self.search([('expires_at', '<', fields.Datetime.now())]).unlink()
@@ -0,0 +1,200 @@
+import csv
+import io
+import logging
+import threading
+import time
+
+from odoo import models, fields, api, _
+
+_logger = logging.getLogger(__name__)
+
+IMPORT_COLUMNS = ['name', 'code', 'material_type', 'buy_price', 'supplier_id']
+# seconds one cron run may spend on a job before handing over to the next run
+IMPORT_TIME_BUDGET = 120
+
+
+class MaterialImportJob(models.Model):
+    _name = 'material.import.job'
+    _description = 'Material Import Job'
+    _order = 'id desc'
+
+    name = fields.Char(string="File Name", required=True)
+    attachment_id = fields.Many2one(comodel_name="ir.attachment", string="File", required=True, ondelete='cascade')
+    file_type = fields.Selection(selection=[('csv', 'CSV'), ('xlsx', 'XLSX')], string="File Type", required=True)
+    state = fields.Selection(
+        selection=[('queued', 'Queued'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')],
+        string="Status", required=True, default='queued', index=True)
+    chunk_size = fields.Integer(string="Chunk Size", required=True, default=1000)
+    processed_rows = fields.Integer(string="Processed Rows", default=0,
+        help="Rows handled by committed chunks; a restarted job resumes after them.")
+    created_count = fields.Integer(string="Created", default=0)
+    error_count = fields.Integer(string="Errors", default=0)
+    error_ids = fields.One2many(comodel_name="material.import.error", inverse_name="job_id", string="Row Errors")
+    message = fields.Text(string="Message")
+
+    @api.model
+    def _cron_process_jobs(self):
+        deadline = time.time() + IMPORT_TIME_BUDGET
+        for job in self.search([('state', 'in', ('queued', 'running'))], order='id'):
+            if not job._process(deadline=deadline):
+                # out of time: let the next cron run resume where this one stopped
+                self.env.ref('addons_material.ir_cron_material_import')._trigger()
+                return
+
+    def _process(self, deadline=None):
+        """
+        Import the rows of the job's file chunk by chunk, committing after each chunk.
+
+        Returns False when ``deadline`` was reached before the end of the file.
+        """
+        self.ensure_one()
+        auto_commit = not getattr(threading.current_thread(), 'testing', False)
+        self.state = 'running'
+        try:
+            rows = self._iter_rows()
+            # skip the rows of the chunks committed by a previous (interrupted) run
+            for _i in range(self.processed_rows):
+                next(rows, None)
+            while True:
+                chunk = [row for _i, row in zip(range(self.chunk_size), rows)]
+                if not chunk:
+                    break
+                self._import_chunk(chunk, first_row=self.processed_rows + 2)
+                if auto_commit:
+                    self.env.cr.commit()
+                if deadline and time.time() > deadline:
+                    return False
+        except Exception as e:
+            if auto_commit:
+                self.env.cr.rollback()
+            _logger.exception("Material import job %s failed", self.id)
+            self.write({'state': 'failed', 'message': str(e)})
+            return True
+        self.state = 'done'
+        return True
+
+    def _iter_rows(self):
+        """Yield the data rows of the file as dicts, without loading it whole when possible."""
+        attachment = self.attachment_id
+        path = attachment._full_path(attachment.store_fname) if attachment.store_fname else None
+        if self.file_type == 'csv':
+            stream = open(path, 'rb') if path else io.BytesIO(attachment.raw)
+            with io.TextIOWrapper(stream, encoding='utf-8-sig', newline='') as text:
+                yield from csv.DictReader(text)
+            return
+
+        try:
+            import openpyxl
+        except ImportError:
+            openpyxl = None
+        if openpyxl:
+            workbook = openpyxl.load_workbook(path or io.BytesIO(attachment.raw), read_only=True, data_only=True)
+            values = workbook.active.iter_rows(values_only=True)
+        else:
+            import xlrd
+            sheet = xlrd.open_workbook(file_contents=attachment.raw).sheet_by_index(0)
+            values = (sheet.row_values(index) for index in range(sheet.nrows))
+        header = [str(column).strip() if column is not None else '' for column in next(values, [])]
+        for row in values:
+            yield dict(zip(header, row))
+
+    def _import_chunk(self, chunk, first_row):
+        """Validate ``chunk`` as a whole and insert its valid rows with one ``create()``."""
+        Material = self.env['material.material'].sudo()
+        errors = []
+        vals_list = []
+        for row_number, row in enumerate(chunk, start=first_row):
+            vals, error = self._row_to_vals(row)
+            if error:
+                errors.append((row_number, row.get('code'), error))
+            else:
+                vals_list.append((row_number, vals))
+
+        price_errors = Material._validate_buy_prices([vals for _row_number, vals in vals_list])
+        errors.extend(
+            (vals_list[index][0], vals_list[index][1]['code'], message) for index, message in price_errors.items())
+        vals_list = [entry for index, entry in enumerate(vals_list) if index not in price_errors]
+
+        codes = [vals['code'] for _row_number, vals in vals_list]
+        taken = {r['code'] for r in Material.search_read([('code', 'in', codes)], ['code'])} if codes else set()
+        supplier_ids = {vals['supplier_id'] for _row_number, vals in vals_list}
+        suppliers = set(self.env['res.partner'].sudo().browse(list(supplier_ids)).exists().ids)
+
+        to_create = []
+        for row_number, vals in vals_list:
+            if vals['code'] in taken:
+                errors.append((row_number, vals['code'], _("Duplicate code. This material code already exists.")))
+            elif vals['supplier_id'] not in suppliers:
+                errors.append((row_number, vals['code'], _("Supplier %s does not exist.") % vals['supplier_id']))
+            else:
+                taken.add(vals['code'])
+                to_create.append((row_number, vals))
+
+        created = self._create_rows(to_create, errors)
+        self.env['material.import.error'].create([{
+            'job_id': self.id,
+            'row': row_number,
+            'code': code,
+            'message': message,
+        } for row_number, code, message in errors])
+        self.write({
+            'processed_rows': self.processed_rows + len(chunk),
+            'created_count': self.created_count + created,
+            'error_count': self.error_count + len(errors),
+        })
+
+    def _create_rows(self, to_create, errors):
+        """Create the rows in one batch; on failure, retry one by one to pinpoint the bad rows."""
+        Material = self.env['material.material'].sudo()
+        if not to_create:
+            return 0
+        try:
+            with self.env.cr.savepoint():
+                Material.create([vals for _row_number, vals in to_create])
+            return len(to_create)
+        except Exception:
+            pass
+        created = 0
+        for row_number, vals in to_create:
+            try:
+                with self.env.cr.savepoint():
+                    Material.create(vals)
+                created += 1
+            except Exception as e:
+                errors.append((row_number, vals['code'], str(e)))
+        return created
+
+    def _row_to_vals(self, row):
+        values = {column: row.get(column) for column in IMPORT_COLUMNS}
+        if isinstance(values['code'], float) and values['code'].is_integer():
+            values['code'] = int(values['code'])
+        values = {k: str(v).strip() if v is not None else '' for k, v in values.items()}
+        missing = [column for column in IMPORT_COLUMNS if not values[column]]
+        if missing:
+            return None, _("Missing fields: %s") % ", ".join(missing)
+        material_type = values['material_type'].lower()
+        if material_type not in dict(self.env['material.material']._fields['material_type'].selection):
+            return None, _("Invalid material type: %s") % values['material_type']
+        try:
+            supplier_id = int(float(values['supplier_id']))
+        except (ValueError, OverflowError):
+            return None, _("Supplier must be a number")
+        return {
+            'name': values['name'],
+            'code': values['code'],
+            'material_type': material_type,
+            'buy_price': values['buy_price'],
+            'supplier_id': supplier_id,
+        }, None
+
+
+class MaterialImportError(models.Model):
+    _name = 'material.import.error'
+    _description = 'Material Import Row Error'
+    _order = 'row'
+
+    job_id = fields.Many2one(comodel_name="material.import.job", string="Import Job", required=True,
+        ondelete='cascade', index=True)
+    row = fields.Integer(string="Row")
+    code = fields.Char(string="Material Code")
+    message = fields.Text(string="Error")
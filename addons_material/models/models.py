@@ -1,11 +1,36 @@
+import logging
+import math
+
+import psycopg2
+
 from odoo import models, fields, api
 from odoo.exceptions import ValidationError
 
+_logger = logging.getLogger(__name__)
+
+# Bumped whenever materials change; API workers compare its value with the
+# one their response cache was filled under (see controllers/response_cache.py).
+API_CACHE_SEQUENCE = 'material_api_cache_signaling'
+
+TOMBSTONE_RETENTION_DAYS = 90
+MIN_BUY_PRICE = 100
+
+# Indexes matching the domains and orderings of the API routes, as
+# (name, columns, partial index predicate). Keyset pagination sorts on id,
+# hence id as the last column. Checked by Material._check_query_plans().
+MATERIAL_INDEXES = [
+    ('material_material_type_id_idx', ['material_type', 'id'], None),
+    ('material_material_type_supplier_id_idx', ['material_type', 'supplier_id', 'id'], None),
+    ('material_material_supplier_id_idx', ['supplier_id', 'id'], None),
+    ('material_material_write_date_id_idx', ['write_date', 'id'], None),
+]
+
 class Material(models.Model):
     _name = 'material.material'
     _description = 'Material'
     _sql_constraints = [
         ('unique_code', 'unique (code)', 'Code must have a unique name.'),
+        ('check_buy_price', 'CHECK (buy_price >= %d)' % MIN_BUY_PRICE, 'Buy Price must be more than 100!'),
     ]
 
     name = fields.Char(string="Material Name", required=True)
@@ -18,30 +43,327 @@ class Material(models.Model):
     buy_price = fields.Monetary(string="Material Buy Price", required=True)
     supplier_id = fields.Many2one(comodel_name="res.partner", string="Related Supplier", required=True)
 
-    @api.constrains('buy_price')
-    def check_buy_price(self):
+    def init(self):
+        self.env.cr.execute("CREATE SEQUENCE IF NOT EXISTS %s" % API_CACHE_SEQUENCE)
+        self._init_trigram_indexes()
+        self._init_api_indexes()
+        self._check_query_plans()
+
+    def _init_api_indexes(self):
+        for name, columns, where in MATERIAL_INDEXES:
+            self.env.cr.execute('CREATE INDEX IF NOT EXISTS "{name}" ON "{table}" ({columns}){where}'.format(
+                name=name,
+                table=self._table,
+                columns=', '.join('"%s"' % column for column in columns),
+                where=' WHERE %s' % where if where else '',
+            ))
+
+    @api.model
+    def _api_query_plans(self):
+        """Return ``[(label, domain, order, limit)]`` of the queries issued by the API routes."""
+        return [
+            ('listing page', [('id', '>', 0)], 'id', 101),
+            ('type listing', [('material_type', '=', 'fabric')], 'id', None),
+            ('type and supplier', [('material_type', '=', 'fabric'), ('supplier_id', '=', 1)], 'id', 101),
+            ('supplier', [('supplier_id', '=', 1)], 'id', 101),
+            ('code lookup', [('code', '=', 'CODE')], None, 1),
+            ('codes lookup', [('code', 'in', ['CODE1', 'CODE2'])], None, None),
+            ('changes feed', [('write_date', '>', '2000-01-01 00:00:00')], 'write_date', 501),
+        ]
+
+    @api.model
+    def _check_query_plans(self):
+        """
+        EXPLAIN every API query with sequential scans disabled.
+
+        A query whose plan still scans ``material_material`` sequentially has no
+        usable index; it is logged and returned as ``[(label, plan)]``.
+        """
+        cr = self.env.cr
+        findings = []
+        cr.execute("SET enable_seqscan = off")
+        try:
+            for label, domain, order, limit in self._api_query_plans():
+                from_clause, where_clause, params = self._where_calc(domain).get_sql()
+                query = 'SELECT "{table}".id FROM {from_clause}{where}{order}{limit}'.format(
+                    table=self._table,
+                    from_clause=from_clause,
+                    where=' WHERE %s' % where_clause if where_clause else '',
+                    order=' ORDER BY "%s"."%s"' % (self._table, order) if order else '',
+                    limit=' LIMIT %d' % limit if limit else '',
+                )
+                cr.execute("EXPLAIN (FORMAT JSON) " + query, params)
+                plan = cr.fetchone()[0][0]['Plan']
+                if self._plan_has_seq_scan(plan):
+                    _logger.warning("Material API query '%s' is not covered by an index: %s", label, plan)
+                    findings.append((label, plan))
+        finally:
+            cr.execute("RESET enable_seqscan")
+        return findings
+
+    def _plan_has_seq_scan(self, plan):
+        if plan.get('Node Type') == 'Seq Scan' and plan.get('Relation Name') == self._table:
+            return True
+        return any(self._plan_has_seq_scan(child) for child in plan.get('Plans', []))
+
+    def _init_trigram_indexes(self):
+        """Create the pg_trgm GIN indexes used by name/code search, when pg_trgm is available."""
+        cr = self.env.cr
+        try:
+            with cr.savepoint():
+                cr.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        except psycopg2.Error:
+            _logger.warning("pg_trgm is not available: material search falls back to sequential ILIKE scans")
+            return
+        for column in ('name', 'code'):
+            cr.execute(
+                'CREATE INDEX IF NOT EXISTS {table}_{column}_trgm_idx ON "{table}" USING gin ("{column}" gin_trgm_ops)'
+                .format(table=self._table, column=column))
+
+    @api.model
+    def _has_trigram(self):
+        self.env.cr.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+        return bool(self.env.cr.rowcount)
+
+    @api.model
+    def _search_by_text(self, text, mode='substring', limit=20):
+        """
+        Return ``[(id, score)]`` of the materials whose name or code matches ``text``.
+
+        ``mode`` is 'prefix', 'substring' or 'fuzzy' (trigram similarity). Prefix
+        and substring matches use the trigram indexes through ILIKE; results are
+        ranked by similarity, exact code prefixes first. Without pg_trgm, fuzzy
+        searches degrade to substring matching and results are ordered by id.
+        """
+        self.flush(['name', 'code'])
+        trigram = self._has_trigram()
+        pattern = text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        if mode == 'fuzzy' and trigram:
+            where = "name %% %(text)s OR code %% %(text)s"
+        elif mode == 'prefix':
+            where = "name ILIKE %(prefix)s OR code ILIKE %(prefix)s"
+        else:
+            where = "name ILIKE %(infix)s OR code ILIKE %(infix)s"
+        score = "greatest(similarity(name, %(text)s), similarity(code, %(text)s))" if trigram else "0"
+        self.env.cr.execute("""
+            SELECT id, {score} AS score
+              FROM "{table}"
+             WHERE {where}
+          ORDER BY code ILIKE %(prefix)s DESC, score DESC, id
+             LIMIT %(limit)s
+        """.format(table=self._table, where=where, score=score), {
+            'text': text,
+            'prefix': pattern + '%',
+            'infix': '%' + pattern + '%',
+            'limit': limit,
+        })
+        return self.env.cr.fetchall()
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super(Material, self).create(vals_list)
+        self._signal_api_cache_change()
+        return records
+
+    def write(self, vals):
+        res = super(Material, self).write(vals)
+        self._signal_api_cache_change()
+        return res
+
+    def unlink(self):
+        tombstones = [{'material_id': record.id, 'code': record.code} for record in self]
+        res = super(Material, self).unlink()
+        self.env['material.tombstone'].sudo().create(tombstones)
+        self._signal_api_cache_change()
+        return res
+
+    @api.model
+    def _get_changes(self, after_write_date=None, after_id=0, limit=500):
+        """
+        Return the ids of the materials written after ``(after_write_date, after_id)``.
+
+        Records are ordered by ``(write_date, id)``, which is the change feed
+        cursor. Note that write_date is the start time of the writing
+        transaction, so a long transaction may commit rows behind an already
+        returned cursor; callers re-read an overlap window to catch them (see
+        MATERIAL_SNAPSHOT_OVERLAP and MATERIAL_CHANGES_OVERLAP).
+        """
+        self.flush(['write_date'])
+        if after_write_date:
+            where, params = 'WHERE (write_date, id) > (%s, %s)', [after_write_date, after_id]
+        else:
+            where, params = '', []
+        self.env.cr.execute(
+            'SELECT id FROM "{table}" {where} ORDER BY write_date, id LIMIT %s'.format(table=self._table, where=where),
+            params + [limit])
+        return [material_id for material_id, in self.env.cr.fetchall()]
+
+    @api.model
+    def _read_snapshot_rows(self, ids=None):
+        """
+        Return ``(id, name, code, material_type, buy_price, supplier_id, write_date)``
+        tuples of the materials in ``ids`` (all of them by default), ordered by id.
+
+        Reads straight from the table, without filling the ORM cache, for the
+        in-memory snapshot of the API (see controllers/material_snapshot.py).
+        """
+        if ids is not None and not ids:
+            return []
+        self.flush(['name', 'code', 'material_type', 'buy_price', 'supplier_id', 'write_date'])
+        where, params = ('WHERE id IN %s', [tuple(ids)]) if ids is not None else ('', [])
+        self.env.cr.execute("""
+            SELECT id, name, code, material_type, buy_price, supplier_id, write_date
+              FROM "{table}" {where} ORDER BY id
+        """.format(table=self._table, where=where), params)
+        return [
+            (material_id, name, code, material_type, float(buy_price or 0.0), supplier_id or False, write_date)
+            for material_id, name, code, material_type, buy_price, supplier_id, write_date in self.env.cr.fetchall()
+        ]
+
+    @api.model
+    def _get_api_cache_generation(self):
+        self.env.cr.execute("SELECT last_value, is_called FROM %s" % API_CACHE_SEQUENCE)
+        last_value, is_called = self.env.cr.fetchone()
+        return last_value if is_called else 0
+
+    @api.model
+    def _signal_api_cache_change(self):
+        """
+        Invalidate the API response caches of every worker.
+
+        The sequence is bumped right away, so that this transaction never reads
+        back stale responses, and once more after commit or rollback, so that
+        responses cached by other workers from pre-commit data are dropped too.
+        """
+        cr = self.env.cr
+        cr.execute("SELECT nextval('%s')" % API_CACHE_SEQUENCE)
+        if cr.postcommit.data.get(API_CACHE_SEQUENCE):
+            return
+        cr.postcommit.data[API_CACHE_SEQUENCE] = True
+        registry = self.pool
+
+        def bump():
+            with registry.cursor() as signal_cr:
+                signal_cr.execute("SELECT nextval('%s')" % API_CACHE_SEQUENCE)
+
+        cr.postcommit.add(bump)
+        cr.postrollback.add(bump)
+
+    @api.model
+    def _validate_buy_prices(self, vals_list):
+        """
+        Return ``{index: message}`` for the entries of ``vals_list`` breaking the buy price rule.
+
+        The rule itself is enforced by the ``check_buy_price`` SQL constraint;
+        this checks a whole batch up front so that callers can report every
+        offending row at once. Entries without a 'buy_price' key are skipped.
+        """
+        errors = {}
+        for index, vals in enumerate(vals_list):
+            if not isinstance(vals, dict) or 'buy_price' not in vals:
+                continue
+            try:
+                buy_price = float(vals['buy_price'])
+            except (TypeError, ValueError):
+                errors[index] = "Buy price must be a number"
+                continue
+            # float() accepts 'nan' and 'inf', which compare false to everything and break Monetary rounding
+            if not math.isfinite(buy_price):
+                errors[index] = "Buy price must be a number"
+                continue
+            if buy_price < MIN_BUY_PRICE:
+                errors[index] = "Buy price must be at least %d" % MIN_BUY_PRICE
+        return errors
+
+    @api.model
+    def _get_listing_validator(self, domain, limit=None):
+        """
+        Return ``(count, max(write_date))`` of the records matching ``domain``.
+
+        With ``limit``, only the first ``limit`` records by id are considered,
+        i.e. exactly one page of the keyset-paginated API listing.
+        """
+        self.flush()
+        query = self._where_calc(domain)
+        from_clause, where_clause, params = query.get_sql()
+        where_str = "WHERE %s" % where_clause if where_clause else ""
+        limit_str = "LIMIT %d" % limit if limit else ""
+        self.env.cr.execute("""
+            SELECT count(*), max(page.write_date)
+              FROM (SELECT "{table}".write_date
+                      FROM {from_clause} {where_str}
+                  ORDER BY "{table}".id {limit_str}) AS page
+        """.format(table=self._table, from_clause=from_clause, where_str=where_str, limit_str=limit_str), params)
+        return self.env.cr.fetchone()
+
+    def _allocate_copy_codes(self):
+        """
+        Return ``{record id: new code}`` for duplicating the records of ``self``.
+
+        Codes follow the '_copy', '_copy_1', ... pattern and the codes already
+        taken are fetched with a single query for the whole recordset.
+        """
+        self.flush(['code'])
+        patterns = [
+            record.code.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '\\_copy%'
+            for record in self
+        ]
+        self.env.cr.execute('SELECT code FROM "%s" WHERE code LIKE ANY(%%s)' % self._table, [patterns])
+        taken = {code for code, in self.env.cr.fetchall()}
+
+        new_codes = {}
         for record in self:
-            if record.buy_price and record.buy_price < 100:
-                raise ValidationError("Buy Price must be more than 100!")
+            base_code = record.code + '_copy'
+            new_code = base_code
+            count = 1
+            while new_code in taken:
+                new_code = f"{base_code}_{count}"
+                count += 1
+            taken.add(new_code)
+            new_codes[record.id] = new_code
+        return new_codes
 
+    @api.returns('self', lambda value: value.id if len(value) == 1 else value.ids)
     def copy(self, default=None):
         """
-        Ensure unique 'code' when duplicating a material record.
+        Ensure unique 'code' when duplicating material records.
 
         Appends '_copy', '_copy_1', etc., to the original code to avoid unique constraint errors.
-        Raises ValidationError if the original code is empty.
+        Duplicating several records at once creates all the copies in one batch.
+        Raises ValidationError if an original code is empty.
         """
-        self.ensure_one()
-        if not self.code:
+        if not self:
+            self.ensure_one()
+        if not all(self.mapped('code')):
             raise ValidationError("Cannot duplicate a material with an empty code.")
 
-        base_code = self.code + '_copy'
-        new_code = base_code
-        count = 1
-        while self.env['material.material'].sudo().search_count([('code', '=', new_code)]):
-            new_code = f"{base_code}_{count}"
-            count += 1
+        new_codes = self._allocate_copy_codes()
+        if len(self) == 1:
+            return super(Material, self).copy(dict(default or {}, code=new_codes[self.id]))
+
+        # same steps as BaseModel.copy(), but with a single create() for all copies
+        vals_list = [
+            record.with_context(active_test=False).copy_data(dict(default or {}, code=new_codes[record.id]))[0]
+            for record in self
+        ]
+        copies = self.with_context(lang=None).create(vals_list).with_env(self.env)
+        for record, new in zip(self, copies):
+            record.with_context(from_copy_translation=True).copy_translations(new, excluded=default or ())
+        return copies
+
+
+class MaterialTombstone(models.Model):
+    _name = 'material.tombstone'
+    _description = 'Deleted Material'
+    _order = 'id'
+    _log_access = False
+
+    material_id = fields.Integer(string="Material ID", required=True, index=True)
+    code = fields.Char(string="Material Code")
+    deleted_at = fields.Datetime(string="Deleted At", required=True, default=fields.Datetime.now)
 
-        default = dict(default or {})
-        default['code'] = new_code
-        return super(Material, self).copy(default)
\ No newline at end of file
+    @api.autovacuum
+    def _gc_tombstones(self):
+        """Forget deletions older than TOMBSTONE_RETENTION_DAYS; slower mirrors must resync."""
+        limit = fields.Datetime.subtract(fields.Datetime.now(), days=TOMBSTONE_RETENTION_DAYS)
+        self.search([('deleted_at', '<', limit)]).unlink()
\ No newline at end of file
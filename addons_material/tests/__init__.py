@@ -1,2 +1,3 @@
 from . import test_material_api
-from . import test_material_model
\ No newline at end of file
+from . import test_material_model
+from . import test_material_import
\ No newline at end of file
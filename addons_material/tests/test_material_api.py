@@ -1,5 +1,11 @@
 from odoo.tests import HttpCase
 from odoo.tests.common import tagged
+from odoo.addons.addons_material.controllers import rate_limit
+from odoo.addons.addons_material.controllers.instrumentation import RequestTracker, metrics
+from odoo.addons.addons_material.controllers.material_snapshot import material_snapshot
+from odoo.addons.addons_material.controllers.response_cache import get_response_cache
+from unittest.mock import patch
+from werkzeug.wrappers import Response as WerkzeugResponse
 import json
 
 @tagged('post_install', '-at_install')
@@ -331,4 +337,640 @@ class TestMaterialAPI(HttpCase):
         data = json.loads(response.text)
         self.assertIn('result', data)
         self.assertEqual(data['result']['status'], 400)
-        self.assertIn('error', data['result'])
\ No newline at end of file
+        self.assertIn('error', data['result'])
+
+    def test_materials_keyset_pagination(self):
+        """Should page through materials with limit/after and return a next cursor."""
+        login = self.login('admin', 'admin')
+        token = login['token']
+        supplier = login['user']
+        for i in range(3):
+            self.env['material.material'].sudo().create({
+                "name": f"Page Material {i}",
+                "code": f"PAGE{i}",
+                "material_type": "cotton",
+                "buy_price": 200,
+                "supplier_id": supplier
+            })
+        response = self.url_open('/api/materials?limit=2', headers={'Authorization': f'Bearer {token}'})
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.text)
+        self.assertEqual(len(data['data']), 2)
+        self.assertEqual(data['next_cursor'], data['data'][-1]['id'])
+
+        response = self.url_open(
+            f"/api/materials?limit=2&after={data['next_cursor']}",
+            headers={'Authorization': f'Bearer {token}'}
+        )
+        data_next = json.loads(response.text)
+        self.assertTrue(all(row['id'] > data['next_cursor'] for row in data_next['data']))
+
+    def test_materials_fields_projection(self):
+        """Should only return the requested fields plus id."""
+        login = self.login('admin', 'admin')
+        token = login['token']
+        response = self.url_open('/api/materials?fields=code,name', headers={'Authorization': f'Bearer {token}'})
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.text)
+        for row in data['data']:
+            self.assertEqual(set(row), {'id', 'code', 'name'})
+
+    def test_materials_invalid_pagination_params(self):
+        """Should return 400 for unknown fields or non-integer cursors."""
+        login = self.login('admin', 'admin')
+        token = login['token']
+        response = self.url_open('/api/materials?fields=password', headers={'Authorization': f'Bearer {token}'})
+        self.assertEqual(response.status_code, 400)
+        response = self.url_open('/api/materials?after=abc', headers={'Authorization': f'Bearer {token}'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_export_materials_ndjson(self):
+        """Should stream every material as one JSON object per line."""
+        login = self.login('admin', 'admin')
+        token = login['token']
+        supplier = login['user']
+        self.env['material.material'].sudo().create({
+            "name": "Exported Material",
+            "code": "EXPORT1",
+            "material_type": "fabric",
+            "buy_price": 300,
+            "supplier_id": supplier
+        })
+        response = self.url_open('/api/materials/export', headers={'Authorization': f'Bearer {token}'})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('application/x-ndjson', response.headers['Content-Type'])
+        rows = [json.loads(line) for line in response.text.splitlines() if line]
+        self.assertIn('EXPORT1', [row['code'] for row in rows])
+
+    def test_export_materials_without_token(self):
+        """Should return 401 when exporting without token."""
+        response = self.url_open('/api/materials/export', headers={})
+        self.assertEqual(response.status_code, 401)
+
+    def test_bulk_create_materials(self):
+        """Should create valid rows in one batch and report invalid or duplicate rows."""
+        login = self.login('admin', 'admin')
+        token = login['token']
+        supplier = login['user']
+        self.env['material.material'].sudo().create({
+            "name": "Existing Bulk",
+            "code": "BULK0",
+            "material_type": "cotton",
+            "buy_price": 150,
+            "supplier_id": supplier
+        })
+        rows = [
+            {"name": "Bulk One", "code": "BULK1", "material_type": "cotton", "buy_price": 150, "supplier_id": supplier},
+            {"name": "Bulk Two", "code": "BULK2", "material_type": "jeans", "buy_price": 250, "supplier_id": supplier},
+            {"name": "Bulk Dup", "code": "BULK0", "material_type": "jeans", "buy_price": 250, "supplier_id": supplier},
+            {"name": "Bulk Cheap", "code": "BULK3", "material_type": "jeans", "buy_price": 50, "supplier_id": supplier},
+            {"name": "Bulk List", "code": ["BULK4"], "material_type": "jeans", "buy_price": 250, "supplier_id": supplier},
+        ]
+        response = self.url_open(
+            '/api/materials/bulk_create',
+            data=json.dumps({"params": {"materials": rows}}),
+            headers={'Authorization': f'Bearer {token}', 'Content-Type': 'application/json'}
+        )
+        self.assertEqual(response.status_code, 200)
+        result = json.loads(response.text)['result']
+        self.assertEqual(result['status'], 207)
+        self.assertEqual(result['created'], 2)
+        self.assertEqual([r['status'] for r in result['results']], [201, 201, 409, 400, 400])
+        self.assertEqual(self.env['material.material'].sudo().search_count([('code', 'in', ['BULK1', 'BULK2'])]), 2)
+
+    def test_bulk_create_materials_requires_list(self):
+        """Should return 400 when materials is not a list."""
+        login = self.login('admin', 'admin')
+        token = login['token']
+        response = self.url_open(
+            '/api/materials/bulk_create',
+            data=json.dumps({"params": {"materials": {}}}),
+            headers={'Authorization': f'Bearer {token}', 'Content-Type': 'application/json'}
+        )
+        result = json.loads(response.text)['result']
+        self.assertEqual(result['status'], 400)
+
+    def test_upsert_materials_by_code(self):
+        """Should update materials matched by code and create unknown codes."""
+        login = self.login('admin', 'admin')
+        token = login['token']
+        supplier = login['user']
+        Material = self.env['material.material'].sudo()
+        existing = Material.create([{
+            "name": f"Upsert {code}",
+            "code": code,
+            "material_type": "cotton",
+            "buy_price": 150,
+            "supplier_id": supplier
+        } for code in ('UPS1', 'UPS2')])
+        rows = [
+            {"code": "UPS1", "buy_price": 500},
+            {"code": "UPS2", "buy_price": 500},
+            {"code": "UPS3", "name": "Upsert New", "material_type": "jeans", "buy_price": 300, "supplier_id": supplier},
+            {"code": "UPS4", "buy_price": 300},
+        ]
+        response = self.url_open(
+            '/api/materials/upsert',
+            data=json.dumps({"params": {"materials": rows}}),
+            headers={'Authorization': f'Bearer {token}', 'Content-Type': 'application/json'}
+        )
+        self.assertEqual(response.status_code, 200)
+        result = json.loads(response.text)['result']
+        self.assertEqual([r['status'] for r in result['results']], [200, 200, 201, 400])
+        self.assertEqual(result['updated'], 2)
+        self.assertEqual(result['created'], 1)
+        existing.invalidate_cache()
+        self.assertEqual(existing.mapped('buy_price'), [500, 500])
+        self.assertTrue(Material.search([('code', '=', 'UPS3')]))
+
+    def test_jwt_cache_hit_on_repeated_token(self):
+        """Should serve repeated calls with the same token from the verification cache."""
+        from odoo.addons.addons_material.controllers.jwt_helper import get_token_cache_stats
+        login = self.login('admin', 'admin')
+        token = login['token']
+        self.url_open('/api/materials', headers={'Authorization': f'Bearer {token}'})
+        hits = get_token_cache_stats()['hits']
+        response = self.url_open('/api/materials', headers={'Authorization': f'Bearer {token}'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(get_token_cache_stats()['hits'], hits + 1)
+
+    def test_invalid_token_rejected(self):
+        """Should return 401 for a token with a bad signature."""
+        response = self.url_open('/api/materials', headers={'Authorization': 'Bearer not-a-token'})
+        self.assertEqual(response.status_code, 401)
+
+    def test_materials_conditional_get(self):
+        """Should answer 304 when the ETag still matches and 200 once data changes."""
+        login = self.login('admin', 'admin')
+        token = login['token']
+        supplier = login['user']
+        headers = {'Authorization': f'Bearer {token}'}
+        response = self.url_open('/api/materials/type/jeans', headers=headers)
+        self.assertEqual(response.status_code, 200)
+        etag = response.headers['ETag']
+
+        response = self.url_open('/api/materials/type/jeans', headers=dict(headers, **{'If-None-Match': etag}))
+        self.assertEqual(response.status_code, 304)
+
+        self.env['material.material'].sudo().create({
+            "name": "Fresh Jeans",
+            "code": "ETAG1",
+            "material_type": "jeans",
+            "buy_price": 200,
+            "supplier_id": supplier
+        })
+        response = self.url_open('/api/materials/type/jeans', headers=dict(headers, **{'If-None-Match': etag}))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers['ETag'], etag)
+
+    def test_material_type_listing_cache_invalidated_on_write(self):
+        """Should not serve a cached type listing after a material changes."""
+        login = self.login('admin', 'admin')
+        token = login['token']
+        supplier = login['user']
+        headers = {'Authorization': f'Bearer {token}'}
+        material = self.env['material.material'].sudo().create({
+            "name": "Cached Cotton",
+            "code": "CACHE1",
+            "material_type": "cotton",
+            "buy_price": 200,
+            "supplier_id": supplier
+        })
+        self.url_open('/api/materials/type/cotton', headers=headers)
+        material.write({'name': 'Renamed Cotton'})
+        response = self.url_open('/api/materials/type/cotton', headers=headers)
+        names = [row['name'] for row in json.loads(response.text)['data']]
+        self.assertIn('Renamed Cotton', names)
+
+    def test_response_cache_per_database(self):
+        """Should not share cached responses between databases with the same generation."""
+        cache = get_response_cache(self.env.cr.dbname)
+        self.assertIs(get_response_cache(self.env.cr.dbname), cache)
+        other = get_response_cache(f'{self.env.cr.dbname}_other')
+        self.assertIsNot(other, cache)
+        generation = other.sync(cache.sync(42))
+        other.set(generation, 'listing', b'[]', '"etag"', None)
+        self.assertIsNone(cache.get('listing'))
+        cache.clear()
+
+    def test_materials_expand_supplier(self):
+        """Should side-load each supplier once and keep supplier_id as a plain id."""
+        login = self.login('admin', 'admin')
+        token = login['token']
+        supplier = login['user']
+        self.env['material.material'].sudo().create([{
+            "name": f"Expand {i}",
+            "code": f"EXPAND{i}",
+            "material_type": "fabric",
+            "buy_price": 200,
+            "supplier_id": supplier
+        } for i in range(2)])
+        response = self.url_open('/api/materials/type/fabric?expand=supplier', headers={'Authorization': f'Bearer {token}'})
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.text)
+        self.assertIn(str(supplier), data['suppliers'])
+        for row in data['data']:
+            self.assertIsInstance(row['supplier_id'], int)
+            self.assertIn(str(row['supplier_id']), data['suppliers'])
+
+    def test_materials_invalid_expand(self):
+        """Should return 400 for an unknown expand option."""
+        login = self.login('admin', 'admin')
+        token = login['token']
+        response = self.url_open('/api/materials?expand=currency', headers={'Authorization': f'Bearer {token}'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_material_stats_by_type(self):
+        """Should return count and min/avg/max buy price per material type."""
+        login = self.login('admin', 'admin')
+        token = login['token']
+        supplier = login['user']
+        self.env['material.material'].sudo().create([{
+            "name": f"Stats {price}",
+            "code": f"STATS{price}",
+            "material_type": "jeans",
+            "buy_price": price,
+            "supplier_id": supplier
+        } for price in (100000000, 300000000)])
+        response = self.url_open('/api/materials/stats?groupby=material_type', headers={'Authorization': f'Bearer {token}'})
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.text)
+        jeans = next(group for group in data['data'] if group['material_type'] == 'jeans')
+        self.assertGreaterEqual(jeans['count'], 2)
+        self.assertEqual(jeans['max_buy_price'], 300000000)
+
+    def test_material_stats_invalid_groupby(self):
+        """Should return 400 when grouping on an unsupported field."""
+        login = self.login('admin', 'admin')
+        token = login['token']
+        response = self.url_open('/api/materials/stats?groupby=name', headers={'Authorization': f'Bearer {token}'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_search_materials_by_name_and_code(self):
+        """Should find materials by partial name or code prefix."""
+        login = self.login('admin', 'admin')
+        token = login['token']
+        supplier = login['user']
+        self.env['material.material'].sudo().create([{
+            "name": "Indigo Selvedge Denim",
+            "code": "SRCH-001",
+            "material_type": "jeans",
+            "buy_price": 200,
+            "supplier_id": supplier
+        }, {
+            "name": "Plain Cotton",
+            "code": "SRCH-002",
+            "material_type": "cotton",
+            "buy_price": 200,
+            "supplier_id": supplier
+        }])
+        headers = {'Authorization': f'Bearer {token}'}
+        response = self.url_open('/api/materials/search?q=selvedge', headers=headers)
+        self.assertEqual(response.status_code, 200)
+        codes = [row['code'] for row in json.loads(response.text)['data']]
+        self.assertEqual(codes, ['SRCH-001'])
+
+        response = self.url_open('/api/materials/search?q=srch-&mode=prefix&limit=1', headers=headers)
+        data = json.loads(response.text)['data']
+        self.assertEqual(len(data), 1)
+        self.assertTrue(data[0]['code'].startswith('SRCH-'))
+
+    def test_search_materials_requires_query(self):
+        """Should return 400 without a search text."""
+        login = self.login('admin', 'admin')
+        token = login['token']
+        response = self.url_open('/api/materials/search?q=', headers={'Authorization': f'Bearer {token}'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_import_materials_queues_job(self):
+        """Should store the uploaded file, queue a job and report its status."""
+        login = self.login('admin', 'admin')
+        token = login['token']
+        content = "name,code,material_type,buy_price,supplier_id\nQueued,QUEUE1,cotton,150,%s\n" % login['user']
+        response = self.url_open(
+            '/api/materials/import',
+            files={'file': ('materials.csv', content.encode(), 'text/csv')},
+            headers={'Authorization': f'Bearer {token}'}
+        )
+        self.assertEqual(response.status_code, 202)
+        job_id = json.loads(response.text)['job_id']
+
+        response = self.url_open(f'/api/materials/import/{job_id}', headers={'Authorization': f'Bearer {token}'})
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.text)
+        self.assertIn(data['state'], ('queued', 'running', 'done'))
+        for errors_limit in ('0', '-5'):
+            response = self.url_open(f'/api/materials/import/{job_id}?errors_limit={errors_limit}',
+                                     headers={'Authorization': f'Bearer {token}'})
+            self.assertEqual(response.status_code, 400)
+
+    def test_material_changes_feed(self):
+        """Should return updates since the cursor and tombstones of deleted materials."""
+        login = self.login('admin', 'admin')
+        token = login['token']
+        supplier = login['user']
+        headers = {'Authorization': f'Bearer {token}'}
+        cursor = None
+        while True:
+            url = '/api/materials/changes?limit=1000' + (f'&since={cursor}' if cursor else '')
+            data = json.loads(self.url_open(url, headers=headers).text)
+            cursor = data['next_cursor']
+            if not data['has_more']:
+                break
+
+        material = self.env['material.material'].sudo().create({
+            "name": "Changed Material",
+            "code": "CHANGE1",
+            "material_type": "cotton",
+            "buy_price": 200,
+            "supplier_id": supplier
+        })
+        response = self.url_open(f'/api/materials/changes?since={cursor}', headers=headers)
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.text)
+        self.assertIn(material.id, [row['id'] for row in data['updated']])
+
+        # the last page rewinds into the overlap window: recent rows are sent again
+        data = json.loads(self.url_open(f"/api/materials/changes?since={data['next_cursor']}", headers=headers).text)
+        self.assertIn(material.id, [row['id'] for row in data['updated']])
+
+        material_id = material.id
+        material.unlink()
+        data = json.loads(self.url_open(f"/api/materials/changes?since={data['next_cursor']}", headers=headers).text)
+        self.assertNotIn(material_id, [row['id'] for row in data['updated']])
+        self.assertIn(material_id, [row['id'] for row in data['deleted']])
+
+    def test_material_changes_invalid_cursor(self):
+        """Should return 400 for a cursor that cannot be decoded."""
+        login = self.login('admin', 'admin')
+        token = login['token']
+        response = self.url_open('/api/materials/changes?since=garbage', headers={'Authorization': f'Bearer {token}'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_server_timing_and_metrics(self):
+        """Should add a Server-Timing header and expose per-route Prometheus metrics."""
+        login = self.login('admin', 'admin')
+        token = login['token']
+        headers = {'Authorization': f'Bearer {token}'}
+        response = self.url_open('/api/materials', headers=headers)
+        self.assertIn('db;dur=', response.headers['Server-Timing'])
+
+        response = self.url_open('/api/metrics', headers=headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('material_api_request_duration_seconds_count{route="get_all_materials"}', response.text)
+        self.assertIn('material_api_jwt_cache_hits_total', response.text)
+
+    def test_streamed_response_recorded_on_close(self):
+        """Should record a streamed response once its body is sent, and label its Server-Timing as setup."""
+        response = WerkzeugResponse(iter([b'[]']))
+        RequestTracker('streamed_test_route', self.env.cr).finish(response)
+        self.assertIn('desc="setup"', response.headers['Server-Timing'])
+        series = 'material_api_request_duration_seconds_count{route="streamed_test_route"}'
+        self.assertNotIn(series, metrics.render())
+        response.close()
+        self.assertIn(series, metrics.render())
+
+    def test_rate_limit_heavy_route(self):
+        """Should answer 429 with Retry-After once the heavy budget of a client is spent."""
+        login = self.login('admin', 'admin')
+        token = login['token']
+        headers = {'Authorization': f'Bearer {token}'}
+        budgets = dict(rate_limit.BUDGETS, heavy=(0.01, 1))
+        rate_limit.rate_limiter.reset()
+        self.addCleanup(rate_limit.rate_limiter.reset)
+        with patch.object(rate_limit, 'BUDGETS', budgets):
+            self.assertEqual(self.url_open('/api/materials', headers=headers).status_code, 200)
+            response = self.url_open('/api/materials', headers=headers)
+            self.assertEqual(response.status_code, 429)
+            self.assertGreater(int(response.headers['Retry-After']), 0)
+            # light routes keep their own budget
+            self.assertEqual(self.url_open('/api/materials/search?q=x', headers=headers).status_code, 200)
+
+    def test_rate_limit_heavy_json_route(self):
+        """Should report 429 in the JSON-RPC result of a type='json' heavy route."""
+        login = self.login('admin', 'admin')
+        headers = {'Authorization': f"Bearer {login['token']}", 'Content-Type': 'application/json'}
+        budgets = dict(rate_limit.BUDGETS, heavy=(0.01, 1))
+        rate_limit.rate_limiter.reset()
+        self.addCleanup(rate_limit.rate_limiter.reset)
+
+        def bulk_delete():
+            response = self.url_open('/api/materials/bulk_delete', headers=headers,
+                                     data=json.dumps({'params': {'ids': [0]}}))
+            return json.loads(response.text)['result']
+
+        with patch.object(rate_limit, 'BUDGETS', budgets):
+            self.assertEqual(bulk_delete()['status'], 207)
+            result = bulk_delete()
+            self.assertEqual(result['status'], 429)
+            self.assertGreater(result['retry_after'], 0)
+
+    def test_refresh_token_rotation_and_revoke(self):
+        """Should mint access tokens from a refresh token, rotate it, and stop both after revocation."""
+        login = self.login('admin', 'admin')
+        self.assertIn('refresh_token', login)
+        self.assertGreater(login['expires_in'], 0)
+
+        def post(url, refresh_token):
+            response = self.url_open(url, data=json.dumps({'params': {'refresh_token': refresh_token}}),
+                                     headers={'Content-Type': 'application/json'})
+            return json.loads(response.text)['result']
+
+        refreshed = post('/api/token/refresh', login['refresh_token'])
+        self.assertEqual(refreshed['status'], 200)
+        self.assertNotEqual(refreshed['refresh_token'], login['refresh_token'])
+        headers = {'Authorization': f"Bearer {refreshed['token']}"}
+        self.assertEqual(self.url_open('/api/materials/search?q=x', headers=headers).status_code, 200)
+
+        # the rotated token cannot be used twice
+        self.assertEqual(post('/api/token/refresh', login['refresh_token'])['status'], 401)
+
+        self.assertEqual(post('/api/token/revoke', refreshed['refresh_token'])['status'], 200)
+        self.assertEqual(post('/api/token/refresh', refreshed['refresh_token'])['status'], 401)
+        self.assertEqual(self.url_open('/api/materials/search?q=x', headers=headers).status_code, 401)
+
+    def test_batch_operations_atomic(self):
+        """Should apply mixed operations in order, and apply none when one of them is invalid."""
+        login = self.login('admin', 'admin')
+        headers = {'Authorization': f"Bearer {login['token']}", 'Content-Type': 'application/json'}
+        Material = self.env['material.material']
+        existing = Material.create({'name': 'Batch', 'code': 'BATCH-1', 'material_type': 'cotton',
+                                    'buy_price': 500, 'supplier_id': login['user']})
+        doomed = Material.create({'name': 'Batch', 'code': 'BATCH-2', 'material_type': 'cotton',
+                                  'buy_price': 500, 'supplier_id': login['user']})
+
+        def batch(operations, mode='atomic'):
+            response = self.url_open('/api/materials/batch', headers=headers, data=json.dumps(
+                {'params': {'operations': operations, 'mode': mode}}))
+            return json.loads(response.text)['result']
+
+        result = batch([
+            {'op': 'update', 'id': existing.id, 'values': {'buy_price': 700}},
+            {'op': 'delete', 'id': doomed.id},
+            # the code freed by the delete above can be reused
+            {'op': 'create', 'values': {'name': 'New', 'code': 'BATCH-2', 'material_type': 'jeans',
+                                        'buy_price': 300, 'supplier_id': login['user']}},
+        ])
+        self.assertEqual(result['status'], 200)
+        self.assertEqual([entry['status'] for entry in result['results']], [200, 200, 201])
+        self.assertEqual(existing.buy_price, 700)
+        self.assertFalse(doomed.exists())
+        self.assertEqual(Material.browse(result['results'][2]['id']).code, 'BATCH-2')
+
+        result = batch([
+            {'op': 'update', 'id': existing.id, 'values': {'buy_price': 900}},
+            {'op': 'delete', 'id': doomed.id},
+        ])
+        self.assertEqual(result['status'], 400)
+        self.assertEqual([entry['status'] for entry in result['results']], [424, 404])
+        existing.invalidate_cache()
+        self.assertEqual(existing.buy_price, 700)
+
+    def test_batch_operations_best_effort(self):
+        """Should keep the valid operations and report the failing ones in best_effort mode."""
+        login = self.login('admin', 'admin')
+        headers = {'Authorization': f"Bearer {login['token']}", 'Content-Type': 'application/json'}
+        operations = [
+            {'op': 'create', 'values': {'name': 'A', 'code': 'BEST-1', 'material_type': 'cotton',
+                                        'buy_price': 300, 'supplier_id': login['user']}},
+            {'op': 'create', 'values': {'name': 'B', 'code': 'BEST-1', 'material_type': 'cotton',
+                                        'buy_price': 300, 'supplier_id': login['user']}},
+            {'op': 'update', 'id': 0, 'values': {'name': 'C'}},
+            {'op': 'rename'},
+            {'op': 'update', 'id': 0, 'values': {'code': ['BEST-2']}},
+        ]
+        response = self.url_open('/api/materials/batch', headers=headers, data=json.dumps(
+            {'params': {'operations': operations, 'mode': 'best_effort'}}))
+        result = json.loads(response.text)['result']
+        self.assertEqual(result['status'], 207)
+        self.assertEqual([entry['status'] for entry in result['results']], [201, 409, 404, 400, 400])
+        self.assertEqual(self.env['material.material'].search_count([('code', '=', 'BEST-1')]), 1)
+
+    def test_bulk_delete(self):
+        """Should delete by ids, report the missing ones, and delete by a restricted filter."""
+        login = self.login('admin', 'admin')
+        headers = {'Authorization': f"Bearer {login['token']}", 'Content-Type': 'application/json'}
+        supplier = self.env['res.partner'].create({'name': 'Bulk delete supplier'})
+        materials = self.env['material.material'].create([{
+            'name': f'Bulk {i}', 'code': f'BULKDEL-{i}', 'material_type': 'cotton',
+            'buy_price': 500, 'supplier_id': supplier.id,
+        } for i in range(4)])
+
+        def bulk_delete(params):
+            response = self.url_open('/api/materials/bulk_delete', headers=headers,
+                                     data=json.dumps({'params': params}))
+            return json.loads(response.text)['result']
+
+        result = bulk_delete({'ids': materials[:2].ids + [0]})
+        self.assertEqual(result['status'], 207)
+        self.assertEqual(result['deleted'], 2)
+        self.assertEqual(result['missing_ids'], [0])
+
+        self.assertEqual(bulk_delete({'filter': {'name': 'Bulk 2'}})['status'], 400)
+        self.assertEqual(bulk_delete({'ids': [True]})['status'], 400)
+        self.assertEqual(bulk_delete({'filter': {'supplier_id': 'Bulk delete supplier'}})['status'], 400)
+        self.assertEqual(bulk_delete({'filter': {'supplier_id': [supplier.id, True]}})['status'], 400)
+        self.assertEqual(bulk_delete({'filter': {'material_type': 'plastic'}})['status'], 400)
+        self.assertEqual(len(materials.exists()), 2)
+        result = bulk_delete({'filter': {'supplier_id': supplier.id}, 'chunk_size': 1})
+        self.assertEqual(result['status'], 200)
+        self.assertEqual(result['deleted'], 2)
+        self.assertFalse(materials.exists())
+
+    def test_response_compression(self):
+        """Should gzip large JSON bodies when accepted and leave small ones uncompressed."""
+        login = self.login('admin', 'admin')
+        self.env['material.material'].create([{
+            'name': f'Compressed material {i}', 'code': f'GZIP-{i}', 'material_type': 'cotton',
+            'buy_price': 500, 'supplier_id': login['user'],
+        } for i in range(50)])
+        headers = {'Authorization': f"Bearer {login['token']}", 'Accept-Encoding': 'gzip'}
+
+        response = self.url_open('/api/materials/type/cotton', headers=headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers.get('Content-Encoding'), 'gzip')
+        self.assertIn('Accept-Encoding', response.headers['Vary'])
+        self.assertIn('GZIP-0', response.text)
+
+        response = self.url_open('/api/materials/type/unknown', headers=headers)
+        self.assertNotIn('Content-Encoding', response.headers)
+
+        response = self.url_open('/api/materials/type/cotton', headers=dict(headers, **{'Accept-Encoding': 'identity'}))
+        self.assertNotIn('Content-Encoding', response.headers)
+
+        # served from the response cache, already compressed
+        response = self.url_open('/api/materials/type/cotton', headers=headers)
+        self.assertEqual(response.headers.get('Content-Encoding'), 'gzip')
+        self.assertIn('GZIP-0', response.text)
+        response = self.url_open('/api/materials/type/cotton', headers=dict(headers, **{'If-None-Match': response.headers['ETag']}))
+        self.assertEqual(response.status_code, 304)
+        self.assertIn('Accept-Encoding', response.headers['Vary'])
+
+    def test_listing_from_snapshot(self):
+        """Should serve listings from the in-memory snapshot and follow creates, writes and deletes."""
+        login = self.login('admin', 'admin')
+        headers = {'Authorization': f"Bearer {login['token']}"}
+        material_snapshot.clear()
+        self.addCleanup(material_snapshot.clear)
+        patcher = patch.object(material_snapshot, 'enabled', True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        Material = self.env['material.material']
+        supplier = self.env['res.partner'].create({'name': 'Snapshot supplier'})
+        first, second = Material.create([{
+            'name': f'Snapshot {i}', 'code': f'SNAP-{i}', 'material_type': 'jeans',
+            'buy_price': 500, 'supplier_id': supplier.id,
+        } for i in range(2)])
+
+        def codes(url):
+            return [row['code'] for row in json.loads(self.url_open(url, headers=headers).text)['data']]
+
+        self.assertEqual(codes(f'/api/materials?supplier_id={supplier.id}'), ['SNAP-0', 'SNAP-1'])
+        first.write({'code': 'SNAP-0-RENAMED'})
+        second.unlink()
+        third = Material.create({'name': 'Snapshot 2', 'code': 'SNAP-2', 'material_type': 'jeans',
+                                 'buy_price': 500, 'supplier_id': supplier.id})
+        # the changes are patched into the existing snapshot, not rebuilt from the table
+        with patch.object(material_snapshot, '_build', side_effect=AssertionError('snapshot rebuilt')):
+            self.assertEqual(codes(f'/api/materials?supplier_id={supplier.id}'), ['SNAP-0-RENAMED', 'SNAP-2'])
+            self.assertIn('SNAP-2', codes('/api/materials/type/jeans'))
+            self.assertEqual(self.url_open('/api/materials/by_code/SNAP-0', headers=headers).status_code, 404)
+        snapshot = material_snapshot.get(self.env)
+        self.assertEqual(snapshot.rows(snapshot.positions_by_ids([third.id]), ['supplier_id']),
+                         [{'id': third.id, 'supplier_id': (supplier.id, 'Snapshot supplier')}])
+
+    def test_get_material_by_id_code_and_lookup(self):
+        """Should fetch one material by id or code and several at once, reporting unknown ones."""
+        login = self.login('admin', 'admin')
+        headers = {'Authorization': f"Bearer {login['token']}"}
+        first, second = self.env['material.material'].create([{
+            'name': f'Lookup {i}', 'code': f'LOOKUP-{i}', 'material_type': 'fabric',
+            'buy_price': 500, 'supplier_id': login['user'],
+        } for i in range(2)])
+
+        response = self.url_open(f'/api/materials/{first.id}', headers=headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.text)['data']['code'], 'LOOKUP-0')
+        response = self.url_open('/api/materials/by_code/LOOKUP-1', headers=headers)
+        self.assertEqual(json.loads(response.text)['data']['id'], second.id)
+        self.assertEqual(self.url_open('/api/materials/by_code/NOPE', headers=headers).status_code, 404)
+
+        data = json.loads(self.url_open(f'/api/materials/lookup?ids={second.id},{first.id},0', headers=headers).text)
+        self.assertEqual([row['id'] for row in data['data']], [second.id, first.id])
+        self.assertEqual(data['missing'], [0])
+        data = json.loads(self.url_open('/api/materials/lookup?codes=LOOKUP-0,NOPE', headers=headers).text)
+        self.assertEqual([row['code'] for row in data['data']], ['LOOKUP-0'])
+        self.assertEqual(data['missing'], ['NOPE'])
+
+    def test_revoke_unknown_token_keeps_jwt_cache(self):
+        """Should not flush verified tokens when an unknown refresh token is revoked."""
+        from odoo.addons.addons_material.controllers.jwt_helper import get_token_cache_stats
+        login = self.login('admin', 'admin')
+        headers = {'Authorization': f"Bearer {login['token']}"}
+        self.url_open('/api/materials/search?q=x', headers=headers)
+        response = self.url_open('/api/token/revoke', data=json.dumps({'params': {'refresh_token': 'junk'}}),
+                                 headers={'Content-Type': 'application/json'})
+        self.assertEqual(json.loads(response.text)['result']['status'], 200)
+        hits = get_token_cache_stats()['hits']
+        self.url_open('/api/materials/search?q=x', headers=headers)
+        self.assertEqual(get_token_cache_stats()['hits'], hits + 1)
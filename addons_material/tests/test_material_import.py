@@ -0,0 +1,55 @@
+from odoo.tests.common import TransactionCase
+
+
+class TestMaterialImport(TransactionCase):
+
+    def setUp(self):
+        super().setUp()
+        self.partner = self.env['res.partner'].create({'name': 'Import Supplier'})
+
+    def _create_job(self, content, chunk_size=2):
+        attachment = self.env['ir.attachment'].create({
+            'name': 'materials.csv',
+            'raw': content.encode(),
+        })
+        return self.env['material.import.job'].create({
+            'name': 'materials.csv',
+            'attachment_id': attachment.id,
+            'file_type': 'csv',
+            'chunk_size': chunk_size,
+        })
+
+    def test_import_csv_in_chunks(self):
+        """Ensure valid rows are created and invalid rows are reported with their line number."""
+        supplier = self.partner.id
+        job = self._create_job(
+            "name,code,material_type,buy_price,supplier_id\n"
+            f"Imported One,IMP001,cotton,150,{supplier}\n"
+            f"Imported Two,IMP002,jeans,250,{supplier}\n"
+            f"Too Cheap,IMP003,jeans,50,{supplier}\n"
+            f"Duplicate,IMP001,jeans,250,{supplier}\n"
+            f"Bad Type,IMP004,plastic,250,{supplier}\n"
+            "Infinite Supplier,IMP005,jeans,250,inf\n"
+        )
+        job._process()
+        self.assertEqual(job.state, 'done')
+        self.assertEqual(job.processed_rows, 6)
+        self.assertEqual(job.created_count, 2)
+        self.assertEqual(job.error_count, 4)
+        self.assertEqual(job.error_ids.mapped('row'), [4, 5, 6, 7])
+        self.assertEqual(self.env['material.material'].search_count([('code', 'in', ['IMP001', 'IMP002'])]), 2)
+
+    def test_import_resumes_after_processed_rows(self):
+        """Ensure a restarted job skips the rows of chunks already committed."""
+        supplier = self.partner.id
+        job = self._create_job(
+            "name,code,material_type,buy_price,supplier_id\n"
+            f"Already Done,RES001,cotton,150,{supplier}\n"
+            f"Pending,RES002,cotton,150,{supplier}\n",
+            chunk_size=1,
+        )
+        job.write({'state': 'running', 'processed_rows': 1})
+        job._process()
+        self.assertEqual(job.state, 'done')
+        self.assertFalse(self.env['material.material'].search([('code', '=', 'RES001')]))
+        self.assertTrue(self.env['material.material'].search([('code', '=', 'RES002')]))
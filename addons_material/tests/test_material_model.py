@@ -1,5 +1,4 @@
 from odoo.tests.common import TransactionCase
-from odoo.exceptions import ValidationError
 from odoo.tools import mute_logger
 from psycopg2 import IntegrityError
 from psycopg2.errors import NotNullViolation
@@ -23,17 +22,19 @@ class TestMaterialModel(TransactionCase):
 
     def test_material_buy_price_too_low(self):
         """Ensure material creation fails if buy_price is less than 100."""
-        with self.assertRaises(ValidationError):
-            self.env['material.material'].create({
-                'name': 'Too Cheap',
-                'code': 'CHEAP001',
-                'material_type': 'cotton',
-                'buy_price': 50,
-                'supplier_id': self.partner.id
-            })
+        with mute_logger('odoo.sql_db'):
+            with self.assertRaises(IntegrityError):
+                self.env['material.material'].create({
+                    'name': 'Too Cheap',
+                    'code': 'CHEAP001',
+                    'material_type': 'cotton',
+                    'buy_price': 50,
+                    'supplier_id': self.partner.id
+                })
+                self.env['material.material'].flush()
 
     def test_update_material_buy_price_too_low(self):
-        """Ensure updating buy_price to less than 100 raises ValidationError."""
+        """Ensure updating buy_price to less than 100 violates the check constraint."""
         material = self.env['material.material'].create({
             'name': 'Valid Material',
             'code': 'LOW001',
@@ -41,8 +42,10 @@ class TestMaterialModel(TransactionCase):
             'buy_price': 150,
             'supplier_id': self.partner.id
         })
-        with self.assertRaises(ValidationError):
-            material.write({'buy_price': 50})
+        with mute_logger('odoo.sql_db'):
+            with self.assertRaises(IntegrityError):
+                material.write({'buy_price': 50})
+                material.flush()
 
     def test_material_code_unique_constraint(self):
         """Ensure creating materials with duplicate code raises IntegrityError."""
@@ -120,4 +123,66 @@ class TestMaterialModel(TransactionCase):
                 'material_type': 'plastic',
                 'buy_price': 150,
                 'supplier_id': self.partner.id
-            })
\ No newline at end of file
+            })
+
+    def test_api_cache_generation_bumped_on_change(self):
+        """Ensure create, write and unlink move the API cache generation."""
+        Material = self.env['material.material']
+        generation = Material._get_api_cache_generation()
+        material = Material.create({
+            'name': 'Cached',
+            'code': 'CACHE01',
+            'material_type': 'cotton',
+            'buy_price': 150,
+            'supplier_id': self.partner.id
+        })
+        self.assertGreater(Material._get_api_cache_generation(), generation)
+        generation = Material._get_api_cache_generation()
+        material.write({'buy_price': 200})
+        self.assertGreater(Material._get_api_cache_generation(), generation)
+        generation = Material._get_api_cache_generation()
+        material.unlink()
+        self.assertGreater(Material._get_api_cache_generation(), generation)
+
+    def test_copy_appends_next_free_suffix(self):
+        """Ensure repeated copies get '_copy', '_copy_1', '_copy_2' codes."""
+        material = self.env['material.material'].create({
+            'name': 'Original',
+            'code': 'ORIG_1%',
+            'material_type': 'cotton',
+            'buy_price': 150,
+            'supplier_id': self.partner.id
+        })
+        codes = [material.copy().code for _i in range(3)]
+        self.assertEqual(codes, ['ORIG_1%_copy', 'ORIG_1%_copy_1', 'ORIG_1%_copy_2'])
+
+    def test_copy_multiple_records(self):
+        """Ensure a recordset can be duplicated at once with distinct codes."""
+        materials = self.env['material.material'].create([{
+            'name': f'Multi {code}',
+            'code': code,
+            'material_type': 'jeans',
+            'buy_price': 150,
+            'supplier_id': self.partner.id
+        } for code in ('MULTI', 'MULTI_copy')])
+        copies = materials.copy()
+        self.assertEqual(len(copies), 2)
+        self.assertEqual(copies.mapped('code'), ['MULTI_copy_1', 'MULTI_copy_copy'])
+
+    def test_api_queries_use_indexes(self):
+        """Ensure every API query plan can be served by an index."""
+        self.assertEqual(self.env['material.material']._check_query_plans(), [])
+
+    def test_validate_buy_prices_reports_all_rows(self):
+        """Ensure batch price validation returns every offending row at once."""
+        errors = self.env['material.material']._validate_buy_prices([
+            {'buy_price': 150},
+            {'buy_price': 50},
+            {'name': 'No price'},
+            {'buy_price': 'abc'},
+            {'buy_price': 99.99},
+            {'buy_price': 'nan'},
+            {'buy_price': 'inf'},
+            {'buy_price': float('inf')},
+        ])
+        self.assertEqual(sorted(errors), [1, 3, 4, 5, 6, 7])
@@ -0,0 +1,57 @@
+"""Micro-benchmark of the material API JSON encoding.
+
+Compares the previous ``json.dumps(...).encode()`` path of the routes with
+``json_codec.dumps`` (orjson, ujson or stdlib, whichever is installed) on
+listings shaped like ``search_read`` output.
+
+Usage::
+
+    python benchmarks/bench_serialization.py [--rows 10000 100000] [--repeat 5]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'addons_material', 'controllers'))
+import json_codec  # noqa: E402
+
+
+def make_rows(count):
+    rnd = random.Random(42)
+    types = ['fabric', 'jeans', 'cotton']
+    suppliers = [(pid, f'Supplier {pid}') for pid in range(1, 51)]
+    return [{
+        'id': i,
+        'name': f'Material {i}',
+        'code': f'MAT-{i:07d}',
+        'material_type': types[i % 3],
+        'buy_price': round(rnd.uniform(100, 100000), 2),
+        'supplier_id': suppliers[i % len(suppliers)],
+    } for i in range(1, count + 1)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f'backend: {json_codec.BACKEND}')
+    for count in args.rows:
+        payload = {'status': 200, 'data': make_rows(count)}
+        candidates = {
+            'json.dumps (before)': lambda: json.dumps(payload).encode(),
+            f'json_codec.dumps ({json_codec.BACKEND})': lambda: json_codec.dumps(payload),
+        }
+        baseline = None
+        for label, func in candidates.items():
+            best = min(timeit.repeat(func, number=1, repeat=args.repeat))
+            baseline = baseline or best
+            print(f'{count:>8} rows  {label:<28} {best * 1000:9.1f} ms  x{baseline / best:4.1f}')
+
+
+if __name__ == '__main__':
+    main()
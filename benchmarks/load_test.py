@@ -0,0 +1,370 @@
+"""Load test and benchmark harness for the material REST API.
+
+Seeds ``material.material`` with synthetic rows at each requested size,
+drives every route of ``MaterialController`` with concurrent clients and
+reports p50/p95/p99 latency, requests per second and SQL queries per
+request. Results are written as JSON so runs of different versions can be
+compared with ``--compare``.
+
+The harness only talks to a local Odoo server and a local PostgreSQL
+database: it refuses any other host.
+
+Usage::
+
+    python benchmarks/load_test.py --db odoo14 --sizes 1000 100000 1000000 \\
+        --concurrency 8 --requests 200 --output bench_output.json
+
+Query counts come from ``pg_stat_statements`` when that extension is
+installed in the database, otherwise they are reported as ``null``.
+Repeated listing calls are served from the API response cache after the
+first one, which is what production polling sees as well.
+
+The Odoo server under test must run with ``RATE_LIMIT_ENABLED=0``: a run
+hitting the per-client rate limiter would time 429 answers instead of the
+API, so the harness aborts on the first one. The access token is renewed
+through ``/api/token/refresh`` before it expires, for long runs.
+"""
+import argparse
+import datetime
+import json
+import math
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+import psycopg2
+
+LOCAL_HOSTS = {'localhost', '127.0.0.1', '::1', ''}
+SEED_PREFIX = 'BENCH-'
+SEED_BATCH = 100000
+# renew the access token this many seconds before it expires
+TOKEN_RENEW_MARGIN = 60
+
+
+class Throttled(Exception):
+    """The server answered 429: the run would measure the rate limiter, not the API."""
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    # nearest-rank method
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100.0 * len(ordered)) - 1)]
+
+
+class Client:
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+        self.token = None
+        self.refresh_token = None
+        self.token_expires = None
+        self._token_lock = threading.Lock()
+
+    def _open(self, path, data=None, method='GET', auth=True):
+        headers = {'Content-Type': 'application/json'}
+        if auth and self.token:
+            if self.token_expires and time.time() > self.token_expires - TOKEN_RENEW_MARGIN:
+                self._renew_token()
+            headers['Authorization'] = f'Bearer {self.token}'
+        body = json.dumps(data).encode() if data is not None else None
+        req = urllib.request.Request(self.base_url + path, data=body, headers=headers, method=method)
+        try:
+            with urllib.request.urlopen(req, timeout=300) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as e:
+            if e.code == 429:
+                raise Throttled(path)
+            return e.code, e.read()
+
+    def get(self, path):
+        return self._open(path)
+
+    def call(self, path, params, auth=True):
+        """JSON-RPC call of a type='json' route; returns (status, result)."""
+        status, body = self._open(path, {'jsonrpc': '2.0', 'params': params}, method='POST', auth=auth)
+        if status != 200:
+            return status, None
+        result = json.loads(body).get('result') or {}
+        if result.get('status') == 429:
+            # type='json' routes report throttling in the result, the HTTP status stays 200
+            raise Throttled(path)
+        return result.get('status', status), result
+
+    def login(self, username, password):
+        status, result = self.call('/api/login', {'username': username, 'password': password})
+        if status != 200:
+            raise SystemExit(f'login failed: {result}')
+        self._set_tokens(result)
+        return result
+
+    def _set_tokens(self, result):
+        self.token = result['token']
+        self.refresh_token = result.get('refresh_token')
+        # servers without refresh tokens do not send expires_in
+        self.token_expires = time.time() + result['expires_in'] if result.get('expires_in') else None
+
+    def _renew_token(self):
+        with self._token_lock:
+            if time.time() <= self.token_expires - TOKEN_RENEW_MARGIN:
+                return  # renewed by another thread meanwhile
+            status, result = self.call('/api/token/refresh', {'refresh_token': self.refresh_token}, auth=False)
+            if status != 200:
+                raise SystemExit(f'token refresh failed: {result}')
+            self._set_tokens(result)
+
+
+class Database:
+    def __init__(self, dbname, host, port, user, password):
+        self.conn = psycopg2.connect(dbname=dbname, host=host or None, port=port, user=user, password=password)
+        self.conn.autocommit = True
+
+    def execute(self, query, params=None):
+        with self.conn.cursor() as cr:
+            cr.execute(query, params)
+            return cr.fetchall() if cr.description else None
+
+    def seed(self, size):
+        """Make the table hold exactly ``size`` benchmark rows."""
+        self.execute("DELETE FROM material_material WHERE code LIKE %s", [SEED_PREFIX + '%'])
+        supplier_ids = [r[0] for r in self.execute("SELECT id FROM res_partner ORDER BY id LIMIT 50")]
+        currency_id = self.execute("SELECT currency_id FROM res_company ORDER BY id LIMIT 1")[0][0]
+        for start in range(1, size + 1, SEED_BATCH):
+            stop = min(size, start + SEED_BATCH - 1)
+            self.execute("""
+                INSERT INTO material_material
+                    (name, code, material_type, buy_price, supplier_id, currency_id,
+                     create_uid, write_uid, create_date, write_date)
+                SELECT 'Bench material ' || n,
+                       %s || lpad(n::text, 8, '0'),
+                       (ARRAY['fabric', 'jeans', 'cotton'])[n %% 3 + 1],
+                       100 + (n %% 100000),
+                       (%s::int[])[n %% %s + 1],
+                       %s, 1, 1, now() at time zone 'UTC', now() at time zone 'UTC'
+                  FROM generate_series(%s, %s) AS n
+            """, [SEED_PREFIX, supplier_ids, len(supplier_ids), currency_id, start, stop])
+        self.execute("ANALYZE material_material")
+        # make API workers drop cached responses of the previous size
+        self.execute("SELECT nextval('material_api_cache_signaling')")
+
+    def query_count(self):
+        try:
+            rows = self.execute(
+                "SELECT sum(calls) FROM pg_stat_statements s JOIN pg_database d ON d.oid = s.dbid "
+                "WHERE d.datname = current_database()")
+        except psycopg2.Error:
+            return None
+        return int(rows[0][0] or 0)
+
+    def first_bench_id(self):
+        return self.execute("SELECT min(id) FROM material_material WHERE code LIKE %s", [SEED_PREFIX + '%'])[0][0]
+
+    def cleanup(self):
+        self.execute("DELETE FROM material_material WHERE code LIKE %s", [SEED_PREFIX + '%'])
+
+
+def run_scenario(name, func, total, concurrency, db):
+    latencies = []
+    errors = []
+    throttled = []
+    lock = threading.Lock()
+    counter = iter(range(total))
+
+    def worker():
+        while not throttled:
+            with lock:
+                index = next(counter, None)
+            if index is None:
+                return
+            start = time.perf_counter()
+            try:
+                ok = func(index)
+            except Throttled as e:
+                throttled.append(str(e))
+                return
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+                if not ok:
+                    errors.append(index)
+
+    queries_before = db.query_count()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = [pool.submit(worker) for _i in range(concurrency)]
+    duration = time.perf_counter() - started
+    queries_after = db.query_count()
+    if throttled:
+        raise SystemExit(f'{name}: {throttled[0]} answered 429 Too Many Requests. '
+                         'Restart the Odoo server with RATE_LIMIT_ENABLED=0 to benchmark the API.')
+    for future in futures:
+        # re-raise what stopped a worker, e.g. a failed token renewal
+        future.result()
+
+    queries = None
+    if queries_before is not None and queries_after is not None:
+        # the two pg_stat_statements probes are counted as well
+        queries = round((queries_after - queries_before - 1) / float(total), 2)
+    result = {
+        'requests': total,
+        'errors': len(errors),
+        'duration_s': round(duration, 3),
+        'rps': round(total / duration, 1) if duration else None,
+        'mean_ms': round(statistics.mean(latencies) * 1000, 2),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+        'queries_per_request': queries,
+    }
+    print(f"  {name:<16} rps={result['rps']:<8} p50={result['p50_ms']:<8} p95={result['p95_ms']:<8} "
+          f"p99={result['p99_ms']:<8} q/req={result['queries_per_request']} errors={result['errors']}")
+    return result
+
+
+def build_scenarios(client, args, db, supplier_id):
+    run_id = uuid.uuid4().hex[:8]
+    created_ids = []
+    ids_lock = threading.Lock()
+    first_id = db.first_bench_id() or 0
+
+    def login(_i):
+        login_client = Client(args.url)
+        status, _result = login_client.call('/api/login', {'username': args.login, 'password': args.password})
+        return status == 200
+
+    def list_first_page(_i):
+        return client.get('/api/materials?limit=100')[0] == 200
+
+    def list_deep_page(i):
+        return client.get(f'/api/materials?limit=100&after={first_id + (i * 997) % max(args.current_size, 1)}')[0] == 200
+
+    def list_type(i):
+        material_type = ('fabric', 'jeans', 'cotton')[i % 3]
+        return client.get(f'/api/materials/type/{material_type}')[0] == 200
+
+    def create(i):
+        status, result = client.call('/api/materials/create', {
+            'name': f'Load test {i}',
+            'code': f'{SEED_PREFIX}LT-{run_id}-{i}',
+            'material_type': 'cotton',
+            'buy_price': 150 + i,
+            'supplier_id': supplier_id,
+        })
+        if status == 201:
+            with ids_lock:
+                created_ids.append(result['id'])
+        return status == 201
+
+    def update(i):
+        with ids_lock:
+            material_id = created_ids[i % len(created_ids)] if created_ids else first_id
+        status, _result = client.call(f'/api/materials/update/{material_id}', {'buy_price': 200 + i})
+        return status == 200
+
+    def delete(_i):
+        with ids_lock:
+            material_id = created_ids.pop() if created_ids else None
+        if material_id is None:
+            return False
+        return client.get(f'/api/materials/delete/{material_id}')[0] == 200
+
+    scenarios = [
+        ('login', login),
+        ('list_first_page', list_first_page),
+        ('list_deep_page', list_deep_page),
+        ('list_type', list_type),
+        ('create', create),
+        ('update', update),
+        ('delete', delete),
+    ]
+    return [(name, func) for name, func in scenarios if not args.scenarios or name in args.scenarios]
+
+
+def compare(current, previous_path):
+    with open(previous_path) as f:
+        previous = json.load(f)
+    print(f'\nComparison with {previous_path} (p95 ms / rps):')
+    for size, scenarios in current['results'].items():
+        for name, result in scenarios.items():
+            before = previous.get('results', {}).get(size, {}).get(name)
+            if not before:
+                continue
+            p95_delta = (result['p95_ms'] - before['p95_ms']) / before['p95_ms'] * 100 if before['p95_ms'] else 0
+            print(f"  {size:>8} {name:<16} p95 {before['p95_ms']:>9} -> {result['p95_ms']:<9} ({p95_delta:+.1f}%)  "
+                  f"rps {before['rps']} -> {result['rps']}")
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the material REST API on a local Odoo.')
+    parser.add_argument('--url', default='http://localhost:8069')
+    parser.add_argument('--db', required=True, help='database name of the Odoo instance')
+    parser.add_argument('--db-host', default='localhost')
+    parser.add_argument('--db-port', type=int, default=5432)
+    parser.add_argument('--db-user')
+    parser.add_argument('--db-password')
+    parser.add_argument('--login', default='admin')
+    parser.add_argument('--password', default='admin')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 100000, 1000000])
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=200, help='requests per scenario')
+    parser.add_argument('--scenarios', nargs='*', help='subset of scenarios to run')
+    parser.add_argument('--output', default='bench_output.json')
+    parser.add_argument('--compare', help='previous result file to compare with')
+    parser.add_argument('--keep', action='store_true', help='keep the seeded rows afterwards')
+    args = parser.parse_args()
+
+    if urlparse(args.url).hostname not in LOCAL_HOSTS or args.db_host not in LOCAL_HOSTS:
+        sys.exit('Refusing to run: the load test only targets a local Odoo and PostgreSQL.')
+
+    db = Database(args.db, args.db_host, args.db_port, args.db_user, args.db_password)
+    client = Client(args.url)
+    login = client.login(args.login, args.password)
+
+    output = {
+        'meta': {
+            'timestamp': datetime.datetime.utcnow().isoformat(),
+            'git_revision': git_revision(),
+            'url': args.url,
+            'db': args.db,
+            'concurrency': args.concurrency,
+            'requests_per_scenario': args.requests,
+            'pg_stat_statements': db.query_count() is not None,
+        },
+        'results': {},
+    }
+    try:
+        for size in args.sizes:
+            print(f'Seeding {size} materials...')
+            db.seed(size)
+            args.current_size = size
+            output['results'][str(size)] = {
+                name: run_scenario(name, func, args.requests, args.concurrency, db)
+                for name, func in build_scenarios(client, args, db, login['user'])
+            }
+    finally:
+        if not args.keep:
+            db.cleanup()
+
+    with open(args.output, 'w') as f:
+        json.dump(output, f, indent=2)
+    print(f'\nResults written to {args.output}')
+    if args.compare:
+        compare(output, args.compare)
+
+
+if __name__ == '__main__':
+    main()